@@ -0,0 +1,298 @@
+"""Seeded benchmarks of the starter bot, the map generator, the engine and the runners.
+
+`run` times every benchmark on the same workloads for a given seed and writes the
+results as JSON; `compare` flags the benchmarks that got slower between two such
+files by more than a threshold, and exits with status 1 if any did:
+
+    python3 -m benchmarks.bench run --output before.json
+    python3 -m benchmarks.bench run --output after.json
+    python3 -m benchmarks.bench compare before.json after.json --threshold 0.05
+
+The workloads are sized by `--scale`; at 1.0, 10^4 states are parsed, 10^4 maps
+generated and 10^5 turns simulated.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import tools.engine
+import tools.map_generator_v2
+import tools.play_utils
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "starterbots", "python_starterbot"))
+from PlanetWars import PlanetWars
+
+RESULTS_VERSION = 1
+GAME_TURNS = 200
+DEFAULT_BOTS = ["example_bots/DualBot.jar", "example_bots/RageBot.jar"]
+
+
+class Skipped(Exception):
+    """Raised while preparing a benchmark that cannot run on this machine."""
+
+
+def _random_orders(game: tools.engine.Game, rng: random.Random):
+    # each player sends half the ships of one of its planets to a random planet
+    for player in tools.engine.PLAYERS:
+        sources = [p for p in game.planets if p.owner == player and p.num_ships > 1]
+        if sources:
+            source = rng.choice(sources)
+            destination = rng.randrange(len(game.planets))
+            if destination != source.planet_id:
+                game.issue_order(
+                    player, f"{source.planet_id} {destination} {source.num_ships // 2}")
+
+
+def _random_games(count: int, seed: int):
+    # yield every state of random games on seeded maps until `count` turns are played
+    rng = random.Random(seed)
+    map_seed = seed
+    while True:
+        game = tools.engine.Game(tools.map_generator_v2.generate_map(map_seed))
+        map_seed += 1
+        while game.winner() is None and game.turn < GAME_TURNS:
+            if count == 0:
+                return
+            yield game
+            _random_orders(game, rng)
+            game.do_time_step()
+            count -= 1
+
+
+# Every benchmark prepares its workload untimed and returns a function that runs
+# it, together with the number of operations the function performs and their unit.
+
+def bench_parse(scale: float, seed: int):
+    count = max(1, int(10 ** 4 * scale))
+    states = []
+    for game in _random_games(count, seed):
+        states.append(game.pov_state(len(states) % 2 + 1)[:-len("go\n")])
+    pw = PlanetWars()
+
+    def run():
+        for state in states:
+            pw.ParseGameState(state)
+
+    return run, count, "states"
+
+
+def bench_map_generation(scale: float, seed: int):
+    count = max(1, int(10 ** 4 * scale))
+
+    def run():
+        for map_seed in range(seed, seed + count):
+            tools.map_generator_v2.generate_map(map_seed)
+
+    return run, count, "maps"
+
+
+def bench_engine_turns(scale: float, seed: int):
+    count = max(1, int(10 ** 5 * scale))
+
+    def run():
+        for _ in _random_games(count, seed):
+            pass
+
+    return run, count, "turns"
+
+
+def bench_starter_simulate(scale: float, seed: int):
+    count = max(1, int(10 ** 5 * scale))
+    rng = random.Random(seed)
+    # the starts are every 4th turn of random games, so that they have fleets
+    starts = []
+    for game in _random_games(GAME_TURNS, seed):
+        if game.turn % 4 == 0:
+            starts.append(PlanetWars(game.pov_state(tools.engine.PLAYER_ONE)))
+    orders = []
+    for pw in starts:
+        planets = pw.Planets()
+        orders.append([(p.PlanetID(), rng.randrange(len(planets)), p.NumShips() // 2)
+                       for p in planets if p.Owner() != 0])
+
+    def run():
+        # every start is simulated for a share of the turns, from a fresh clone
+        turns = count // len(starts)
+        for i, (pw, start_orders) in enumerate(zip(starts, orders)):
+            extra = 1 if i < count % len(starts) else 0
+            pw.Clone().Simulate(start_orders, turns + extra)
+
+    return run, count, "turns"
+
+
+def bench_batch_simulation(scale: float, seed: int):
+    try:
+        import numpy as np
+        import tools.simulation
+    except ImportError:
+        raise Skipped("NumPy is not installed")
+    batch_size = 500
+    count = max(batch_size, int(10 ** 5 * scale)) // batch_size * batch_size
+    rng = np.random.default_rng(seed)
+    start = tools.simulation.BatchState.from_map(
+        tools.map_generator_v2.generate_map(seed), batch_size)
+    num_planets = start.num_planets
+    steps = count // batch_size
+    orders = [(np.arange(batch_size), rng.integers(0, num_planets, batch_size),
+               rng.integers(0, num_planets, batch_size), rng.integers(1, 20, batch_size))
+              for _ in range(steps)]
+
+    def run():
+        state = start.copy()
+        for game, source, destination, num_ships in orders:
+            state.step(game, source, destination, num_ships)
+
+    return run, count, "state-turns"
+
+
+def bench_games(scale: float, seed: int, bots=None):
+    count = max(1, int(10 * scale))
+    bots = bots or DEFAULT_BOTS
+    try:
+        commands = tools.play_utils.resolve_all(bots)
+    except RuntimeError as error:
+        raise Skipped(str(error))
+    player_one, player_two = (commands[bot] for bot in bots)
+    maps = [tools.map_generator_v2.generate_map(map_seed) for map_seed in range(seed, seed + count)]
+
+    def run():
+        for map_data in maps:
+            tools.engine.Game(map_data).play(player_one, player_two)
+
+    return run, count, "games"
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "map_generation": bench_map_generation,
+    "engine_turns": bench_engine_turns,
+    "starter_simulate": bench_starter_simulate,
+    "batch_simulation": bench_batch_simulation,
+    "games": bench_games,
+}
+
+
+def run_benchmarks(names, scale: float = 1.0, seed: int = 0, repeat: int = 3,
+                   bots=None) -> dict:
+    results = {}
+    for name in names:
+        kwargs = {"bots": bots} if name == "games" else {}
+        try:
+            run, operations, unit = BENCHMARKS[name](scale, seed, **kwargs)
+        except Skipped as reason:
+            print(f"{name}: skipped ({reason})", file=sys.stderr)
+            results[name] = {"skipped": str(reason)}
+            continue
+        seconds = []
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - started)
+        best = min(seconds)
+        results[name] = {
+            "operations": operations,
+            "unit": unit,
+            "seconds": seconds,
+            "best": best,
+            "median": statistics.median(seconds),
+            "rate": operations / best,
+        }
+        print(f"{name}: {operations / best:,.0f} {unit}/s (best of {repeat}: {best:.3f} s)",
+              file=sys.stderr)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": len(tools.play_utils.available_cpus()),
+        "scale": scale,
+        "seed": seed,
+        "benchmarks": results,
+    }
+
+
+def compare_results(old: dict, new: dict, threshold: float) -> list:
+    """Return a (name, change, verdict) row for every benchmark in `new`.
+
+    The change is the relative change in time per operation, and the verdict is
+    "regression" or "improvement" when the change is beyond `threshold`.
+    """
+    rows = []
+    for name, new_result in new["benchmarks"].items():
+        old_result = old["benchmarks"].get(name)
+        if not old_result or "skipped" in old_result or "skipped" in new_result:
+            rows.append((name, None, "not compared"))
+            continue
+        old_time = old_result["best"] / old_result["operations"]
+        new_time = new_result["best"] / new_result["operations"]
+        change = new_time / old_time - 1
+        if change > threshold:
+            verdict = "regression"
+        elif change < -threshold:
+            verdict = "improvement"
+        else:
+            verdict = "unchanged"
+        rows.append((name, change, verdict))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run benchmarks or compare their results.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks and write their results.")
+    run_parser.add_argument("--output", action="store", default="", type=str,
+                            help="file to write the results to (default: standard output).",
+                            dest="output")
+    run_parser.add_argument("--only", action="append", default=None, choices=list(BENCHMARKS),
+                            help="benchmark to run; can be given several times (default: all).",
+                            dest="only")
+    run_parser.add_argument("--scale", action="store", default=1.0, type=float,
+                            help="factor applied to the size of every workload.", dest="scale")
+    run_parser.add_argument("--seed", action="store", default=0, type=int,
+                            help="seed of the workloads.", dest="seed")
+    run_parser.add_argument("--repeat", action="store", default=3, type=int,
+                            help="number of times every benchmark is timed.", dest="repeat")
+    run_parser.add_argument("--bots", action="store", default=None, type=str, nargs=2,
+                            help="bot files to play the `games` benchmark between "
+                                 f"(default: {' '.join(DEFAULT_BOTS)}).", dest="bots")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare two result files and exit with status 1 on regressions.")
+    compare_parser.add_argument("old", action="store", type=str, help="results to compare to.")
+    compare_parser.add_argument("new", action="store", type=str, help="results to compare.")
+    compare_parser.add_argument("--threshold", action="store", default=0.05, type=float,
+                                help="relative slowdown above which a benchmark regressed.",
+                                dest="threshold")
+    arguments = parser.parse_args()
+
+    if arguments.command == "run":
+        results = run_benchmarks(arguments.only or list(BENCHMARKS), arguments.scale,
+                                 arguments.seed, arguments.repeat, arguments.bots)
+        if arguments.output:
+            with open(arguments.output, "w") as output_file:
+                json.dump(results, output_file, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+    else:
+        with open(arguments.old) as old_file, open(arguments.new) as new_file:
+            old_results, new_results = json.load(old_file), json.load(new_file)
+        if old_results["seed"] != new_results["seed"]:
+            print("warning: the results were measured on workloads with different seeds.",
+                  file=sys.stderr)
+        rows = compare_results(old_results, new_results, arguments.threshold)
+        for name, change, verdict in rows:
+            change = "" if change is None else f"{change:+.1%}"
+            print(f"  {name:<18} {change:>8}  {verdict}")
+        if any(verdict == "regression" for _, _, verdict in rows):
+            sys.exit(1)
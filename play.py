@@ -1,11 +1,15 @@
 import argparse
 import os
-import subprocess
+import random
 import sys
 
+import tools.engine
+import tools.map_store
 import tools.play_utils
+import tools.timing
 import tools.map_generator as map_generator
 import tools.map_generator_v2
+import visualizer.visualize_locally
 
 
 def generate_map(f):
@@ -26,6 +30,15 @@ if __name__ == "__main__":
     parser.add_argument(
         "--delete_map", action="store_true", dest="delete_map",
         help="whether to delete the generated map after playing the game.")
+    parser.add_argument(
+        "--map_store", action="store", default="", type=str,
+        help="store of maps (see `tools/map_store.py`) to choose the map from instead of "
+             "generating it.", dest="map_store")
+    parser.add_argument(
+        "--map_filter", action="append", default=None, type=str,
+        help="\"<feature>=<value>\", \"min_<feature>=<value>\" or \"max_<feature>=<value>\" "
+             "that the map chosen from the `--map_store` must match; can be given several "
+             "times.", dest="map_filters")
     parser.add_argument(
         "--old_maps", action="store_true", dest="old_maps",
         help="whether to generate maps using the old map generator.")
@@ -38,6 +51,10 @@ if __name__ == "__main__":
     parser.add_argument(
         "--log_filename", action="store", default="", type=str,
         help="file to store the game logs.", dest="log_filename")
+    parser.add_argument(
+        "--replay_filename", action="store", default="", type=str,
+        help="file to store a compact replay of the game (see `tools/replay.py`).",
+        dest="replay_filename")
     parser.add_argument(
         "--manual_commands", action="store_true", dest="manual_commands",
         help="use `player_one` and `player_two` values directly instead of automatically "
@@ -51,31 +68,49 @@ if __name__ == "__main__":
         "player_two", action="store", type=str, help="command to run the second bot.")
     arguments = parser.parse_args()
 
-    if not arguments.old_maps:
-        map_generator = tools.map_generator_v2
-    generate_map(arguments.map_file_name)
+    if arguments.map_store:
+        matching = tools.map_store.MapStore(arguments.map_store).select(
+            **tools.map_store.parse_filters(arguments.map_filters))
+        if not matching:
+            parser.error(f"no map in \"{arguments.map_store}\" matches the filters.")
+        stored_map = random.choice(matching)
+        print(f"Playing on map {stored_map.name}.", file=sys.stderr)
+    else:
+        stored_map = None
+        if not arguments.old_maps:
+            map_generator = tools.map_generator_v2
+        generate_map(arguments.map_file_name)
 
     if not arguments.manual_commands:
-        player_one = tools.play_utils.get_command(arguments.player_one)
-        player_two = tools.play_utils.get_command(arguments.player_two)
+        commands = tools.play_utils.resolve_all((arguments.player_one, arguments.player_two))
+        player_one = commands[arguments.player_one]
+        player_two = commands[arguments.player_two]
     else:
         player_one = arguments.player_one
         player_two = arguments.player_two
 
-    subprocess.call(
-        "java -jar tools/PlayGame-1.2.jar {} {} {} \"{}\" \"{}\" \"{}\" {}".format(
+    if stored_map:
+        game = tools.engine.Game(stored_map.map_data, arguments.max_turn_time,
+                                 arguments.max_num_turns)
+        result = game.play(player_one, player_two, arguments.log_filename,
+                           replay_filename=arguments.replay_filename)
+    else:
+        result = tools.engine.play_game(
             arguments.map_file_name,
             arguments.max_turn_time,
             arguments.max_num_turns,
-            arguments.log_filename,
             player_one,
             player_two,
-            "" if arguments.no_visualize
-            else "| {} visualizer/visualize_locally.py".format(tools.play_utils.PYTHON)
-        ),
-        stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr,
-        shell=True
-    )
+            arguments.log_filename,
+            replay_filename=arguments.replay_filename
+        )
+    print(result.verdict, file=sys.stderr)
+    for player, player_timings in result.timings.items():
+        summary = tools.timing.format_summary(tools.timing.summarize(player_timings))
+        print(f"Player {player} timing: {summary}", file=sys.stderr)
+
+    if not arguments.no_visualize:
+        visualizer.visualize_locally.visualize(result.playback)
 
-    if arguments.delete_map:
+    if arguments.delete_map and not stored_map:
         os.remove(arguments.map_file_name)
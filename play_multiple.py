@@ -1,13 +1,80 @@
 import argparse
+import multiprocessing
 import os
-import shlex
-import subprocess
+import random
 
+import tools.async_engine
+import tools.engine
+import tools.map_store
 import tools.play_utils
+import tools.results
+import tools.sprt
+import tools.timing
 import tools.map_generator as map_generator
 import tools.map_generator_v2
 
-GAME_ENGINE_COMMAND = "java -jar tools/PlayGame-1.2.jar"
+
+def generate_map(map_seed, old_maps, stored_map=None):
+    if stored_map:
+        return stored_map.map_data
+    if old_maps:
+        random.seed(map_seed)
+        return map_generator.generate_map()
+    return tools.map_generator_v2.generate_map(map_seed)
+
+
+def play_game(game_number, map_seed, old_maps, max_turn_time, max_num_turns, player_one,
+              player_two, replay_dir, cold_start, stored_map):
+    game = tools.engine.Game(generate_map(map_seed, old_maps, stored_map), max_turn_time,
+                             max_num_turns)
+    replay_filename = os.path.join(replay_dir, f"game{game_number + 1}.pwr") if replay_dir else ""
+    bot_pool = None if cold_start else tools.play_utils.worker_bot_pool()
+    result = game.play(player_one, player_two, cpus=tools.play_utils.worker_cpus,
+                       replay_filename=replay_filename, bot_pool=bot_pool)
+    return make_record(game_number, map_seed, old_maps, stored_map, player_one, player_two,
+                       result)
+
+
+def make_record(game_number, map_seed, old_maps, stored_map, player_one, player_two, result):
+    record = {
+        "game": game_number,
+        "map_seed": map_seed,
+        "old_maps": old_maps,
+        # name of the map in the `--map_store`, if any
+        "map": stored_map.name if stored_map else None,
+        "player_one": player_one,
+        "player_two": player_two,
+        "winner": result.winner,
+        "verdict": result.verdict,
+        "turns": result.turns,
+        "errors": result.errors,
+        "timings": {player: tools.timing.summarize(player_timings)
+                    for player, player_timings in result.timings.items()},
+    }
+    return record, result.timings
+
+
+def play_game_star(game_arguments):
+    # games left in the pool once the SPRT has decided are skipped
+    if tools.play_utils.games_cancelled():
+        return None
+    return play_game(*game_arguments)
+
+
+def play_games_async(games, concurrency, max_turn_time, max_num_turns):
+    # play the games given as `play_game` arguments concurrently from this process
+    specs = []
+    for (game_number, map_seed, old_maps, _, _, player_one, player_two, replay_dir, _,
+         stored_map) in games:
+        replay_filename = \
+            os.path.join(replay_dir, f"game{game_number + 1}.pwr") if replay_dir else ""
+        specs.append(((game_number, map_seed, old_maps, stored_map, player_one, player_two),
+                      generate_map(map_seed, old_maps, stored_map), player_one, player_two,
+                      replay_filename))
+    for key, result in tools.async_engine.play_games(
+            specs, concurrency, max_turn_time, max_num_turns):
+        yield make_record(*key, result)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -15,6 +82,16 @@ if __name__ == "__main__":
     parser.add_argument(
         "--old_maps", action="store_true", dest="old_maps",
         help="whether to generate maps using the old map generator.")
+    parser.add_argument(
+        "--map_store", action="store", default="", type=str,
+        help="store of maps (see `tools/map_store.py`) to choose the maps from instead of "
+             "generating them; game N is played on a map chosen with seed `seed + N - 1`.",
+        dest="map_store")
+    parser.add_argument(
+        "--map_filter", action="append", default=None, type=str,
+        help="\"<feature>=<value>\", \"min_<feature>=<value>\" or \"max_<feature>=<value>\" "
+             "that the maps chosen from the `--map_store` must match; can be given several "
+             "times.", dest="map_filters")
     parser.add_argument(
         "--max_turn_time", action="store", default=1000, type=int,
         help="maximum time (in ms) that a bot can have on its turn.", dest="max_turn_time")
@@ -25,6 +102,46 @@ if __name__ == "__main__":
         "--manual_commands", action="store_true", dest="manual_commands",
         help="use `player_one` and `player_two` values directly instead of automatically "
              "determining commands from the filenames.")
+    parser.add_argument(
+        "--jobs", action="store", default=1, type=int,
+        help="number of games to play in parallel.", dest="jobs")
+    parser.add_argument(
+        "--asyncio", action="store_true", dest="asyncio",
+        help="play the games from this process with `tools/async_engine.py`; `--jobs` is then "
+             "the number of games played at once.")
+    parser.add_argument(
+        "--cold_start", action="store_true", dest="cold_start",
+        help="start new bot processes for every game instead of keeping the bots that support "
+             "sessions (see `tools/engine.py`) alive between games.")
+    parser.add_argument(
+        "--timings", action="store_true", dest="timings",
+        help="whether to print a timing summary for each bot after every game.")
+    parser.add_argument(
+        "--replay_dir", action="store", default="", type=str,
+        help="directory to store a compact replay of every game in (see `tools/replay.py`).",
+        dest="replay_dir")
+    parser.add_argument(
+        "--seed", action="store", default=None, type=int,
+        help="map seed of the first game; game N is played on the map with seed `seed + N - 1`.",
+        dest="seed")
+    parser.add_argument(
+        "--results", action="store", default="", type=str,
+        help="file to append the result of every game to, one JSON object per line.",
+        dest="results")
+    parser.add_argument(
+        "--resume", action="store_true", dest="resume",
+        help="skip the games already recorded in the `--results` file.")
+    parser.add_argument(
+        "--sprt", action="store", default=None, type=float, nargs=2, metavar=("ELO0", "ELO1"),
+        help="stop as soon as a sequential probability ratio test decides between the Elo "
+             "difference of the first bot over the second being ELO0 (H0) or ELO1 (H1); "
+             "`number_games` is then the maximum number of games.", dest="sprt")
+    parser.add_argument(
+        "--sprt_alpha", action="store", default=0.05, type=float,
+        help="probability of accepting H1 when H0 is true.", dest="sprt_alpha")
+    parser.add_argument(
+        "--sprt_beta", action="store", default=0.05, type=float,
+        help="probability of accepting H0 when H1 is true.", dest="sprt_beta")
     parser.add_argument(
         "player_one", action="store", type=str, help="command to run the first bot.")
     parser.add_argument(
@@ -33,12 +150,10 @@ if __name__ == "__main__":
         "number_games", action="store", type=int, help="number of games to play.")
     arguments = parser.parse_args()
 
-    if not arguments.old_maps:
-        map_generator = tools.map_generator_v2
-
     if not arguments.manual_commands:
-        player_one = tools.play_utils.get_command(arguments.player_one)
-        player_two = tools.play_utils.get_command(arguments.player_two)
+        commands = tools.play_utils.resolve_all((arguments.player_one, arguments.player_two))
+        player_one = commands[arguments.player_one]
+        player_two = commands[arguments.player_two]
     else:
         player_one = arguments.player_one
         player_two = arguments.player_two
@@ -47,29 +162,108 @@ if __name__ == "__main__":
 
     # (draw, bot one, bot two)
     result_tracker_list = [0, 0, 0]
+    # the turn timings of each bot across all the games played in this run
+    timing_tracker = {1: [], 2: []}
 
-    for game_number in range(arguments.number_games):
-        map_path = f"maps/multiple{game_number + 1}.txt"
-        map_generator.save_map(map_path)
-        command = "{} {} {} {} \"\" \"{}\" \"{}\"".format(
-            GAME_ENGINE_COMMAND, map_path, arguments.max_turn_time, arguments.max_num_turns,
-            player_one, player_two
-        )
-
-        result = subprocess.run(
-            shlex.split(command), stdout=open(os.devnull, "w+"), stderr=subprocess.PIPE
-        )
-
-        verdict = result.stderr.decode().strip().split("\n")[-1]
-        if verdict.count(" ") == 2:
-            result_tracker_list[int(verdict.split(" ")[1])] += 1
-        else:
-            result_tracker_list[0] += 1
+    completed = set()
+    if arguments.resume:
+        if not arguments.results:
+            parser.error("--resume requires --results.")
+        for record in tools.results.load_results(arguments.results):
+            if (record["player_one"], record["player_two"]) != (player_one, player_two):
+                parser.error(f"\"{arguments.results}\" has results of other bots.")
+            if arguments.seed is None:
+                arguments.seed = record["map_seed"] - record["game"]
+            completed.add(record["game"])
+            result_tracker_list[record["winner"]] += 1
+        print(f"Resuming after {len(completed)} recorded games "
+              f"(+{result_tracker_list[1]}={result_tracker_list[0]}-{result_tracker_list[2]})")
+    if arguments.seed is None:
+        arguments.seed = random.randrange(2 ** 32)
+    results_writer = tools.results.ResultsWriter(arguments.results) if arguments.results else None
+
+    stored_maps = None
+    if arguments.map_store:
+        stored_maps = tools.map_store.MapStore(arguments.map_store).select(
+            **tools.map_store.parse_filters(arguments.map_filters))
+        if not stored_maps:
+            parser.error(f"no map in \"{arguments.map_store}\" matches the filters.")
 
-        print(f"Game {game_number + 1} verdict: {verdict}", end="  ")
+    games = [
+        (game_number, arguments.seed + game_number, arguments.old_maps, arguments.max_turn_time,
+         arguments.max_num_turns, player_one, player_two, arguments.replay_dir,
+         arguments.cold_start,
+         random.Random(arguments.seed + game_number).choice(stored_maps) if stored_maps else None)
+        for game_number in range(arguments.number_games) if game_number not in completed
+    ]
+
+    if arguments.asyncio:
+        pool = None
+        verdicts = play_games_async(
+            games, arguments.jobs, arguments.max_turn_time, arguments.max_num_turns)
+    elif arguments.jobs > 1:
+        cancelled = multiprocessing.Event()
+        pool = tools.play_utils.create_pool(arguments.jobs, cancelled)
+        verdicts = pool.imap_unordered(play_game_star, games)
+    else:
+        pool = None
+        verdicts = map(play_game_star, games)
+
+    sprt_result = None
+    for verdict in verdicts:
+        if verdict is None:
+            continue
+        record, timings = verdict
+        if results_writer:
+            results_writer.write(record)
+        result_tracker_list[record["winner"]] += 1
+
+        print(f"Game {record['game'] + 1} verdict: {record['verdict']}", end="  ")
         print(f"(+{result_tracker_list[1]}={result_tracker_list[0]}-{result_tracker_list[2]})")
 
+        for player, player_timings in timings.items():
+            timing_tracker[player].extend(player_timings)
+            if arguments.timings:
+                summary = tools.timing.format_summary(tools.timing.summarize(player_timings))
+                print(f"  Player {player} timing: {summary}")
+
+        if arguments.sprt:
+            sprt_result = tools.sprt.sprt_decision(
+                result_tracker_list[1], result_tracker_list[0], result_tracker_list[2],
+                *arguments.sprt, arguments.sprt_alpha, arguments.sprt_beta)
+            if sprt_result:
+                break
+
+    if arguments.asyncio:
+        # stop the games still being played
+        verdicts.close()
+    if pool is not None:
+        # games still being played are not needed once the test has decided; the
+        # workers skip the games they have not started and finish the others, so
+        # that the bots of every game are shut down
+        if sprt_result:
+            cancelled.set()
+        pool.close()
+        pool.join()
+    if results_writer:
+        results_writer.close()
+
     print("---")
     print(f"  Player 1 wins: {result_tracker_list[1]}")
     print(f"  Player 2 wins: {result_tracker_list[2]}")
     print(f"  Draws: {result_tracker_list[0]}")
+    if sum(result_tracker_list):
+        low, elo, high = tools.sprt.elo_estimate(
+            result_tracker_list[1], result_tracker_list[0], result_tracker_list[2])
+        print(f"  Elo difference: {elo:.1f} (95% interval {low:.1f} to {high:.1f})")
+    if arguments.sprt:
+        games_played = sum(result_tracker_list)
+        if sprt_result:
+            elo0, elo1 = arguments.sprt
+            accepted = f"H0 (Elo {elo0:g})" if sprt_result == "H0" else f"H1 (Elo {elo1:g})"
+            print(f"  SPRT: accepted {accepted} after {games_played} games")
+        else:
+            print(f"  SPRT: undecided after {games_played} games")
+    for player, player_timings in timing_tracker.items():
+        summary = tools.timing.format_summary(tools.timing.summarize(player_timings))
+        print(f"  Player {player} timing: {summary}")
@@ -15,6 +15,8 @@
 """
 
 from PlanetWars import PlanetWars
+from Profiling import TurnProfiler
+from Protocol import EndGame, SessionOffered, TimedTurns
 
 
 def DoTurn(pw):
@@ -51,16 +53,26 @@ def DoTurn(pw):
 
 
 def main():
-    map_data = ''
-    while True:
-        current_line = input()
-        if len(current_line) >= 2 and current_line.startswith("go"):
-            pw = PlanetWars(map_data)
-            DoTurn(pw)
-            pw.FinishTurn()
-            map_data = ''
-        else:
-            map_data += current_line + '\n'
+    pw = PlanetWars()
+    # None unless profiling is enabled, see Profiling.py.
+    profiler = TurnProfiler.FromEnvironment()
+    if SessionOffered():
+        pw.EnableSession()
+    for game_state, arrival in TimedTurns():
+        if game_state is None:
+            # The game is over and the engine is about to start another one.
+            pw.NewGame()
+            if profiler:
+                profiler.NewGame()
+            EndGame()
+            continue
+        if profiler:
+            profiler.Start()
+        pw.ParseGameState(game_state, arrival)
+        DoTurn(pw)
+        pw.FinishTurn()
+        if profiler:
+            profiler.Stop()
 
 
 if __name__ == '__main__':
@@ -1,11 +1,76 @@
 #!/usr/bin/env python
 #
 
+import random
+from array import array
 from math import ceil, sqrt
-from sys import stdout
+from time import perf_counter
+
+from Protocol import SESSION_LINE, WriteOrders
+
+# The time (in ms) that tools/engine.py gives bots for each turn by default.
+# As in the specification, the first turn is no longer: the additional
+# startup time is given before the first game state is sent.
+TURN_TIME = 1000
+
+# PlanetWars.Hash() combines Zobrist keys: random 64-bit numbers drawn from
+# generators seeded with HASH_SEED, so that they are the same in every
+# process. Each planet has a key for its owner and number of SHIP_BUCKET
+# ships, and the keys of the planets are combined with XOR. With a bucket
+# larger than 1, states with nearly the same ships on each planet share their
+# hash. The key of a fleet mixes keys for its owner, ships, source,
+# destination and trip length, and is multiplied by FLEET_MULTIPLIER for each
+# turn it has left. The keys of the fleets are added (modulo 2 ** 64) rather
+# than combined with XOR, so that identical fleets do not cancel out and
+# advancing all fleets by a turn only takes a multiplication by
+# FLEET_INVERSE.
+SHIP_BUCKET = 1
+HASH_SEED = 20100901
+HASH_MASK = (1 << 64) - 1
+FLEET_MULTIPLIER = 0x9E3779B97F4A7C15
+FLEET_INVERSE = pow(FLEET_MULTIPLIER, -1, 1 << 64)
+FLEET_POWERS = [pow(FLEET_MULTIPLIER, turns, 1 << 64) for turns in range(64)]
+
+
+class _KeyTable(list):
+    # Random keys for the numbers 0, 1, 2, ..., drawn as they are needed.
+
+    def __init__(self, name):
+        list.__init__(self)
+        self._random = random.Random("%d %s" % (HASH_SEED, name))
+
+    def Key(self, index):
+        while index >= len(self):
+            self.append(self._random.getrandbits(64))
+        return self[index]
+
+
+# The planet keys of each (planet_id, owner), indexed by ship bucket.
+_PLANET_KEYS = {}
+_FLEET_KEYS = [_KeyTable("fleet " + field) for field in
+               ("owner", "ships", "source", "destination", "trip length")]
+
+
+def _PlanetKey(planet_id, owner, num_ships):
+    keys = _PLANET_KEYS.get((planet_id, owner))
+    if keys is None:
+        keys = _PLANET_KEYS[planet_id, owner] = _KeyTable("planet %d %d" % (planet_id, owner))
+    bucket = num_ships // SHIP_BUCKET
+    if bucket < len(keys):
+        return keys[bucket]
+    return keys.Key(bucket)
+
+
+class TimeUp(Exception):
+    # Raised by PlanetWars.CheckTime() and Simulate() when a search started by
+    # PlanetWars.Search() has used up its time.
+    pass
 
 
 class Fleet:
+    __slots__ = ("_owner", "_num_ships", "_source_planet", "_destination_planet",
+                 "_total_trip_length", "_turns_remaining")
+
     def __init__(self, owner, num_ships, source_planet, destination_planet,
                  total_trip_length, turns_remaining):
         self._owner = owner
@@ -33,8 +98,26 @@ class Fleet:
     def TurnsRemaining(self):
         return self._turns_remaining
 
+    def _BaseKey(self):
+        # The key of the fleet once it has arrived.
+        # The field keys are mixed by multiplication so that fleets with
+        # their fields swapped around have unrelated keys.
+        key = 0
+        for keys, value in zip(_FLEET_KEYS, (self._owner, self._num_ships, self._source_planet,
+                                             self._destination_planet, self._total_trip_length)):
+            key = (key * FLEET_MULTIPLIER + keys.Key(value)) & HASH_MASK
+        return key
+
+    def _Key(self):
+        turns = self._turns_remaining
+        if turns < len(FLEET_POWERS):
+            return self._BaseKey() * FLEET_POWERS[turns] & HASH_MASK
+        return self._BaseKey() * pow(FLEET_MULTIPLIER, turns, 1 << 64) & HASH_MASK
+
 
 class Planet:
+    __slots__ = ("_planet_id", "_owner", "_num_ships", "_growth_rate", "_x", "_y")
+
     def __init__(self, planet_id, owner, num_ships, growth_rate, x, y):
         self._planet_id = planet_id
         self._owner = owner
@@ -73,9 +156,41 @@ class Planet:
 
 
 class PlanetWars:
-    def __init__(self, gameState):
+    # The time.perf_counter() at which a search started by Search() must
+    # stop, shared by every PlanetWars instance, or None outside of searches.
+    _search_deadline = None
+
+    def __init__(self, gameState=""):
         self._planets = []
         self._fleets = []
+        self._fleet_pool = []
+        self._my_planets = []
+        self._neutral_planets = []
+        self._enemy_planets = []
+        self._not_my_planets = []
+        self._my_fleets = []
+        self._enemy_fleets = []
+        self._shared = False
+        # Planets never move, so the distances between them are computed once
+        # per game, and clones share them.
+        self._coordinates = None
+        self._distances = None
+        self._nearest_planets = None
+        # The hash is only computed once it is asked for, and then kept up to
+        # date by Simulate() until the next game state is parsed.
+        self._hash_stale = True
+        self._planets_hash = 0
+        self._fleets_hash = 0
+        self._orders = []
+        self._timing_report = False
+        self._announce_session = False
+        self._parse_started = 0.0
+        self._parse_finished = 0.0
+        self._last_write = 0.0
+        self._turn_time = TURN_TIME
+        self._first_turn_time = TURN_TIME
+        self._turn_started = perf_counter()
+        self._deadline = self._turn_started + self._first_turn_time / 1000
         self.ParseGameState(gameState)
 
     def NumPlanets(self):
@@ -93,56 +208,55 @@ class PlanetWars:
     def Planets(self):
         return self._planets
 
+    # The views of the planets and fleets by owner are built once per turn by
+    # _IndexByOwner(), so they reflect the game state as it was last parsed.
+
     def MyPlanets(self):
-        r = []
-        for p in self._planets:
-            if p.Owner() != 1:
-                continue
-            r.append(p)
-        return r
+        return list(self._my_planets)
 
     def NeutralPlanets(self):
-        r = []
-        for p in self._planets:
-            if p.Owner() != 0:
-                continue
-            r.append(p)
-        return r
+        return list(self._neutral_planets)
 
     def EnemyPlanets(self):
-        r = []
-        for p in self._planets:
-            if p.Owner() <= 1:
-                continue
-            r.append(p)
-        return r
+        return list(self._enemy_planets)
 
     def NotMyPlanets(self):
-        r = []
-        for p in self._planets:
-            if p.Owner() == 1:
-                continue
-            r.append(p)
-        return r
+        return list(self._not_my_planets)
 
     def Fleets(self):
         return self._fleets
 
     def MyFleets(self):
-        r = []
-        for f in self._fleets:
-            if f.Owner() != 1:
-                continue
-            r.append(f)
-        return r
+        return list(self._my_fleets)
 
     def EnemyFleets(self):
-        r = []
-        for f in self._fleets:
-            if f.Owner() <= 1:
+        return list(self._enemy_fleets)
+
+    def _IndexByOwner(self):
+        my_planets = self._my_planets
+        neutral_planets = self._neutral_planets
+        enemy_planets = self._enemy_planets
+        not_my_planets = self._not_my_planets
+        del my_planets[:], neutral_planets[:], enemy_planets[:], not_my_planets[:]
+        for p in self._planets:
+            owner = p._owner
+            if owner == 1:
+                my_planets.append(p)
                 continue
-            r.append(f)
-        return r
+            not_my_planets.append(p)
+            if owner == 0:
+                neutral_planets.append(p)
+            else:
+                enemy_planets.append(p)
+
+        my_fleets = self._my_fleets
+        enemy_fleets = self._enemy_fleets
+        del my_fleets[:], enemy_fleets[:]
+        for f in self._fleets:
+            if f._owner == 1:
+                my_fleets.append(f)
+            elif f._owner > 1:
+                enemy_fleets.append(f)
 
     def ToString(self):
         s = ''
@@ -156,16 +270,247 @@ class PlanetWars:
         return s
 
     def Distance(self, source_planet, destination_planet):
-        source = self._planets[source_planet]
-        destination = self._planets[destination_planet]
-        dx = source.X() - destination.X()
-        dy = source.Y() - destination.Y()
-        return int(ceil(sqrt(dx * dx + dy * dy)))
+        return self._distances[source_planet][destination_planet]
+
+    def Distances(self):
+        # Row i holds the distances from planet i to every planet.
+        return self._distances
+
+    def NearestPlanets(self, planet_id):
+        # The IDs of all other planets, from nearest to farthest.
+        return self._nearest_planets[planet_id]
+
+    def _ComputeDistances(self):
+        coordinates = [(p.X(), p.Y()) for p in self._planets]
+        if coordinates == self._coordinates:
+            return
+        distances = []
+        for x1, y1 in coordinates:
+            row = array("i")
+            for x2, y2 in coordinates:
+                dx = x1 - x2
+                dy = y1 - y2
+                row.append(int(ceil(sqrt(dx * dx + dy * dy))))
+            distances.append(row)
+        nearest_planets = []
+        for planet_id, row in enumerate(distances):
+            others = [i for i in range(len(row)) if i != planet_id]
+            others.sort(key=row.__getitem__)
+            nearest_planets.append(others)
+        self._coordinates = coordinates
+        self._distances = distances
+        self._nearest_planets = nearest_planets
+
+    def Hash(self):
+        # A 64-bit hash of the owner and ships of each planet and of the
+        # fleets, for looking up states in a TranspositionTable (see
+        # Transpositions.py). Simulate() updates it as it changes the state;
+        # call Rehash() after changing planets or fleets directly.
+        if self._hash_stale:
+            self.Rehash()
+        return self._planets_hash ^ self._fleets_hash
+
+    def Rehash(self):
+        planets_hash = 0
+        for p in self._planets:
+            planets_hash ^= _PlanetKey(p._planet_id, p._owner, p._num_ships)
+        self._planets_hash = planets_hash
+        self._fleets_hash = sum(f._Key() for f in self._fleets) & HASH_MASK
+        self._hash_stale = False
 
     def IssueOrder(self, source_planet, destination_planet, num_ships):
-        stdout.write("%d %d %d\n" %
-                     (source_planet, destination_planet, num_ships))
-        stdout.flush()
+        # Orders are buffered and sent all at once by FinishTurn().
+        self._orders.append("%d %d %d\n" %
+                            (source_planet, destination_planet, num_ships))
+
+    def Clone(self):
+        # Returns a copy of the game state. The copy shares its planets and
+        # fleets with this object until either of them is changed by
+        # Simulate() or ParseGameState(), so cloning is cheap; planets and
+        # fleets of a clone must not be changed directly.
+        clone = PlanetWars.__new__(PlanetWars)
+        clone.__dict__.update(self.__dict__)
+        clone._shared = True
+        clone._orders = []
+        self._shared = True
+        return clone
+
+    def _Unshare(self):
+        if not self._shared:
+            return
+        self._planets = [Planet(p._planet_id, p._owner, p._num_ships, p._growth_rate, p._x, p._y)
+                         for p in self._planets]
+        self._fleets = [Fleet(f._owner, f._num_ships, f._source_planet, f._destination_planet,
+                              f._total_trip_length, f._turns_remaining)
+                        for f in self._fleets]
+        self._fleet_pool = list(self._fleets)
+        self._my_planets = []
+        self._neutral_planets = []
+        self._enemy_planets = []
+        self._not_my_planets = []
+        self._my_fleets = []
+        self._enemy_fleets = []
+        self._IndexByOwner()
+        self._shared = False
+
+    def Simulate(self, orders=(), turns=1):
+        # Advances the game state in place by the given number of turns, as the
+        # game engine would. orders is a list of (source_planet,
+        # destination_planet, num_ships) tuples carried out on the first turn
+        # on behalf of the owner of each source planet. Orders that the engine
+        # would reject are ignored. Raises TimeUp, before changing anything,
+        # once a search started by Search() has used up its time.
+        if (PlanetWars._search_deadline is not None
+                and perf_counter() > PlanetWars._search_deadline):
+            raise TimeUp()
+        self._Unshare()
+        planets = self._planets
+        fleets = self._fleets
+        distances = self._distances
+        # The hash is only updated if it has been computed (see Hash()).
+        hashing = not self._hash_stale
+        planets_hash = self._planets_hash
+        fleets_hash = self._fleets_hash
+        bucket = SHIP_BUCKET
+
+        # Departure.
+        for source_planet, destination_planet, num_ships in orders:
+            if not (0 <= source_planet < len(planets)
+                    and 0 <= destination_planet < len(planets)):
+                continue
+            # Ship counts are sent as integers (see IssueOrder()), so
+            # fractions are dropped here too.
+            num_ships = int(num_ships)
+            source = planets[source_planet]
+            if (source._owner == 0 or source_planet == destination_planet
+                    or not 0 < num_ships <= source._num_ships):
+                continue
+            if hashing:
+                planets_hash ^= _PlanetKey(source_planet, source._owner, source._num_ships)
+            source._num_ships -= num_ships
+            trip_length = distances[source_planet][destination_planet]
+            fleet = Fleet(source._owner, num_ships, source_planet,
+                          destination_planet, trip_length, trip_length)
+            fleets.append(fleet)
+            if hashing:
+                planets_hash ^= _PlanetKey(source_planet, source._owner, source._num_ships)
+                fleets_hash += fleet._Key()
+
+        for _ in range(turns):
+            # Advancement.
+            for p in planets:
+                if p._owner != 0:
+                    p._num_ships += p._growth_rate
+            if hashing:
+                fleets_hash *= FLEET_INVERSE
+                for p in planets:
+                    # Only planets whose ships reached another bucket change
+                    # their key.
+                    if p._owner != 0 and p._num_ships % bucket < p._growth_rate:
+                        planets_hash ^= (
+                            _PlanetKey(p._planet_id, p._owner, p._num_ships - p._growth_rate)
+                            ^ _PlanetKey(p._planet_id, p._owner, p._num_ships))
+            arrivals = {}
+            in_flight = []
+            for f in fleets:
+                f._turns_remaining -= 1
+                if f._turns_remaining > 0:
+                    in_flight.append(f)
+                    continue
+                if hashing:
+                    fleets_hash -= f._BaseKey()
+                forces = arrivals.setdefault(f._destination_planet, {})
+                forces[f._owner] = forces.get(f._owner, 0) + f._num_ships
+            fleets[:] = in_flight
+
+            # Arrival: the largest force wins and loses as many ships as the
+            # second largest force has. If they are tied, the original owner
+            # keeps the planet with no ships.
+            for planet_id, forces in arrivals.items():
+                p = planets[planet_id]
+                if hashing:
+                    planets_hash ^= _PlanetKey(planet_id, p._owner, p._num_ships)
+                forces[p._owner] = forces.get(p._owner, 0) + p._num_ships
+                first_owner, first_ships = 0, -1
+                second_ships = 0
+                for owner, num_ships in forces.items():
+                    if num_ships > first_ships:
+                        second_ships = max(first_ships, 0)
+                        first_owner, first_ships = owner, num_ships
+                    elif num_ships > second_ships:
+                        second_ships = num_ships
+                if first_ships == second_ships:
+                    p._num_ships = 0
+                else:
+                    p._owner = first_owner
+                    p._num_ships = first_ships - second_ships
+                if hashing:
+                    planets_hash ^= _PlanetKey(planet_id, p._owner, p._num_ships)
+            if hashing:
+                fleets_hash &= HASH_MASK
+
+        if hashing:
+            self._planets_hash = planets_hash
+            self._fleets_hash = fleets_hash & HASH_MASK
+        self._IndexByOwner()
+
+    def PackState(self):
+        # Returns the game state as a flat array of numbers: the number of
+        # planets and of fleets, then the x, y, owner, ships and growth rate of
+        # each planet, then the owner, ships, source, destination, total trip
+        # length and turns remaining of each fleet. See UnpackState().
+        values = array("d", (len(self._planets), len(self._fleets)))
+        for p in self._planets:
+            values.extend((p._x, p._y, p._owner, p._num_ships, p._growth_rate))
+        for f in self._fleets:
+            values.extend((f._owner, f._num_ships, f._source_planet, f._destination_planet,
+                           f._total_trip_length, f._turns_remaining))
+        return values
+
+    def UnpackState(self, values):
+        # Replaces the game state with one returned by PackState(). values can
+        # be any sequence of numbers, such as a memoryview of shared memory.
+        # Like ParseGameState(), the planets and fleets are updated in place
+        # where possible.
+        self._Unshare()
+        planets = self._planets
+        fleets = self._fleets
+        fleet_pool = self._fleet_pool
+        num_planets = int(values[0])
+        num_fleets = int(values[1])
+        i = 2
+        if (len(planets) != num_planets
+                or any(p._x != values[i + 5 * p._planet_id]
+                       or p._y != values[i + 5 * p._planet_id + 1] for p in planets)):
+            planets[:] = [Planet(planet_id, int(values[i + 5 * planet_id + 2]),
+                                 int(values[i + 5 * planet_id + 3]),
+                                 int(values[i + 5 * planet_id + 4]),
+                                 values[i + 5 * planet_id], values[i + 5 * planet_id + 1])
+                          for planet_id in range(num_planets)]
+            self._ComputeDistances()
+        else:
+            for p in planets:
+                p._owner = int(values[i + 2])
+                p._num_ships = int(values[i + 3])
+                i += 5
+        i = 2 + 5 * num_planets
+        del fleets[:]
+        for _ in range(num_fleets):
+            if len(fleets) < len(fleet_pool):
+                f = fleet_pool[len(fleets)]
+            else:
+                f = Fleet(0, 0, 0, 0, 0, 0)
+                fleet_pool.append(f)
+            f._owner = int(values[i])
+            f._num_ships = int(values[i + 1])
+            f._source_planet = int(values[i + 2])
+            f._destination_planet = int(values[i + 3])
+            f._total_trip_length = int(values[i + 4])
+            f._turns_remaining = int(values[i + 5])
+            fleets.append(f)
+            i += 6
+        self._IndexByOwner()
+        self._hash_stale = True
 
     def IsAlive(self, player_id):
         for p in self._planets:
@@ -176,13 +521,119 @@ class PlanetWars:
                 return True
         return False
 
-    def ParseGameState(self, s):
-        self._planets = []
-        self._fleets = []
-        lines = s.split("\n")
+    def EnableTimingReport(self):
+        # Reports how long each turn took to parse, think about and write to
+        # the game engine in tools/engine.py, which includes it in its timing
+        # summaries. The report is sent as a "# timing" line before "go" and
+        # the write time reported is that of the previous turn. Other engines
+        # may treat the report as an invalid order.
+        self._timing_report = True
+
+    def SetTurnTime(self, turn_time, first_turn_time=None):
+        # Sets the time (in ms) that the engine gives the bot for each turn
+        # and for the first turn of a game, which TimeRemaining() counts down
+        # from. The first turn is as long as the others by default, as in
+        # tools/engine.py and the specification; engines that give the
+        # startup time on the first turn instead need a longer
+        # first_turn_time.
+        self._turn_time = turn_time
+        if first_turn_time is None:
+            first_turn_time = turn_time
+        self._first_turn_time = first_turn_time
+
+    def TimeRemaining(self):
+        # The time (in seconds) left before the engine stops waiting for the
+        # orders of the current turn, which is negative once it has passed.
+        # The turn starts when the game state arrives (see ParseGameState()).
+        return self._deadline - perf_counter()
+
+    def CheckTime(self):
+        # Raises TimeUp if a search started by Search() has used up its time.
+        # Searches that spend long stretches without calling Simulate() should
+        # call this regularly.
+        deadline = PlanetWars._search_deadline
+        if deadline is not None and perf_counter() > deadline:
+            raise TimeUp()
+
+    def Search(self, search, fraction=0.9, max_depth=None):
+        # Runs an iterative-deepening search within the time of the turn.
+        # search(depth) is called with depth 1, 2, ... and returns the best
+        # orders it found as a list of (source_planet, destination_planet,
+        # num_ships) tuples. Once fraction of the turn's time has passed, the
+        # search is cut off by TimeUp being raised from Simulate() or
+        # CheckTime(), and the orders of the deepest completed depth are
+        # issued so that FinishTurn() sends them in time. A depth is not
+        # started if the previous one took longer than the time that is left.
+        # Returns the deepest completed depth.
+        budget = self._deadline - self._turn_started
+        deadline = self._turn_started + fraction * budget
+        best = None
+        depth = 0
+        last_duration = 0.0
+        PlanetWars._search_deadline = deadline
+        try:
+            while max_depth is None or depth < max_depth:
+                started = perf_counter()
+                if started + last_duration > deadline:
+                    break
+                try:
+                    orders = search(depth + 1)
+                except TimeUp:
+                    break
+                best = orders
+                depth += 1
+                last_duration = perf_counter() - started
+        finally:
+            PlanetWars._search_deadline = None
+        for source_planet, destination_planet, num_ships in best or ():
+            self.IssueOrder(source_planet, destination_planet, num_ships)
+        return depth
+
+    def EnableSession(self):
+        # Tells the game engine in tools/engine.py that this process can play
+        # several games, which saves starting a new one for every game. The
+        # bot must then call NewGame() and Protocol.EndGame() whenever
+        # Protocol.Turns() or Protocol.TimedTurns() yields None instead of a
+        # game state. Only enable it when Protocol.SessionOffered() is true,
+        # as other engines may treat the announcement as an invalid order.
+        self._announce_session = True
+
+    def NewGame(self):
+        # Forgets the game being played, so that the next game state parsed
+        # can be that of a different map.
+        self._Unshare()
+        del self._planets[:]
+        del self._fleets[:]
+        del self._orders[:]
+        self._last_write = 0.0
+        self._IndexByOwner()
+        self._hash_stale = True
+
+    def ParseGameState(self, s, arrival=None):
+        # A PlanetWars object can be reused for every turn of a game: planets
+        # never change, so after the first turn only their owners and ship counts
+        # are updated in place, and Fleet objects are recycled from a pool. This
+        # means Planet and Fleet objects must not be kept from one turn to the
+        # next expecting them to be unchanged.
+        # The turn's time is counted from arrival, the time.perf_counter() at
+        # which the game state was received (see Protocol.TimedTurns()), or
+        # from now if it is not given.
+        if arrival is None:
+            arrival = perf_counter()
+        self._turn_started = arrival
+        turn_time = self._turn_time if self._planets else self._first_turn_time
+        self._deadline = arrival + turn_time / 1000
+        if self._timing_report:
+            self._parse_started = perf_counter()
+        self._Unshare()
+        planets = self._planets
+        fleets = self._fleets
+        fleet_pool = self._fleet_pool
+        del fleets[:]
         planet_id = 0
+        new_planets = False
 
-        for line in lines:
+        for line in s.split("\n"):
             line = line.split("#")[0]  # remove comments
             tokens = line.split(" ")
             if len(tokens) == 1:
@@ -190,28 +641,62 @@ class PlanetWars:
             if tokens[0] == "P":
                 if len(tokens) != 6:
                     return 0
-                p = Planet(planet_id,  # The ID of this planet
-                           int(tokens[3]),  # Owner
-                           int(tokens[4]),  # Num ships
-                           int(tokens[5]),  # Growth rate
-                           float(tokens[1]),  # X
-                           float(tokens[2]))  # Y
+                if planet_id < len(planets):
+                    p = planets[planet_id]
+                    p._owner = int(tokens[3])
+                    p._num_ships = int(tokens[4])
+                else:
+                    p = Planet(planet_id,  # The ID of this planet
+                               int(tokens[3]),  # Owner
+                               int(tokens[4]),  # Num ships
+                               int(tokens[5]),  # Growth rate
+                               float(tokens[1]),  # X
+                               float(tokens[2]))  # Y
+                    planets.append(p)
+                    new_planets = True
                 planet_id += 1
-                self._planets.append(p)
             elif tokens[0] == "F":
                 if len(tokens) != 7:
                     return 0
-                f = Fleet(int(tokens[1]),  # Owner
-                          int(tokens[2]),  # Num ships
-                          int(tokens[3]),  # Source
-                          int(tokens[4]),  # Destination
-                          int(tokens[5]),  # Total trip length
-                          int(tokens[6]))  # Turns remaining
-                self._fleets.append(f)
+                if len(fleets) < len(fleet_pool):
+                    f = fleet_pool[len(fleets)]
+                    f._owner = int(tokens[1])
+                    f._num_ships = int(tokens[2])
+                    f._source_planet = int(tokens[3])
+                    f._destination_planet = int(tokens[4])
+                    f._total_trip_length = int(tokens[5])
+                    f._turns_remaining = int(tokens[6])
+                else:
+                    f = Fleet(int(tokens[1]),  # Owner
+                              int(tokens[2]),  # Num ships
+                              int(tokens[3]),  # Source
+                              int(tokens[4]),  # Destination
+                              int(tokens[5]),  # Total trip length
+                              int(tokens[6]))  # Turns remaining
+                    fleet_pool.append(f)
+                fleets.append(f)
             else:
                 return 0
+        del planets[planet_id:]
+        if new_planets:
+            self._ComputeDistances()
+        self._IndexByOwner()
+        self._hash_stale = True
+        if self._timing_report:
+            self._parse_finished = perf_counter()
         return 1
 
     def FinishTurn(self):
-        stdout.write("go\n")
-        stdout.flush()
+        if self._timing_report:
+            started = perf_counter()
+            self._orders.append("# timing %.3f %.3f %.3f\n" % (
+                1000 * (self._parse_finished - self._parse_started),
+                1000 * (started - self._parse_finished),
+                1000 * self._last_write))
+        if self._announce_session:
+            self._orders.append(SESSION_LINE)
+            self._announce_session = False
+        WriteOrders(self._orders)
+        if self._timing_report:
+            self._last_write = perf_counter() - started
+        del self._orders[:]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+
+import cProfile
+import marshal
+import os
+
+# Profiling is enabled by setting PLANETWARS_PROFILE to the file that the
+# profiles are written to, since the game engine does not show what the bot
+# writes to stderr. PLANETWARS_PROFILE_TURNS optionally selects the turns to
+# profile, for example "1-5,100"; by default every turn is profiled.
+# Aggregate the profiles with tools/profiles.py from the starter package.
+# Every bot process started with the variable set, such as both players of a
+# game, writes to the file; %p in its name is replaced by the process ID to
+# give each process a file of its own.
+PROFILE_VARIABLE = "PLANETWARS_PROFILE"
+TURNS_VARIABLE = "PLANETWARS_PROFILE_TURNS"
+# Set by the engine to the player that the bot plays as.
+PLAYER_VARIABLE = "PLANETWARS_PLAYER"
+
+
+class TurnProfiler:
+    # Profiles selected turns with cProfile and appends the statistics of
+    # each one to a file as marshalled (pid, player, game, turn, stats)
+    # records, where player is 0 if the engine did not give it and stats is
+    # in the format of pstats. Each record is appended with a single write,
+    # so that processes sharing the file do not mix up their records.
+
+    def __init__(self, path, turns=None, player=0):
+        self._file = open(path.replace("%p", str(os.getpid())), "ab", buffering=0)
+        self._turns = turns
+        self._player = player
+        self._profile = None
+        self._game = 0
+        self._turn = 0
+
+    @staticmethod
+    def FromEnvironment():
+        # Returns a profiler if profiling is enabled, otherwise None.
+        path = os.environ.get(PROFILE_VARIABLE)
+        if not path:
+            return None
+        return TurnProfiler(path, ParseTurns(os.environ.get(TURNS_VARIABLE, "")),
+                            int(os.environ.get(PLAYER_VARIABLE) or 0))
+
+    def NewGame(self):
+        self._game += 1
+        self._turn = 0
+
+    def Start(self):
+        # Starts profiling the next turn, if it is one of the selected turns.
+        self._turn += 1
+        if self._turns is not None and self._turn not in self._turns:
+            return
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def Stop(self):
+        if self._profile is None:
+            return
+        self._profile.disable()
+        self._profile.create_stats()
+        self._file.write(marshal.dumps((os.getpid(), self._player, self._game, self._turn,
+                                        self._profile.stats)))
+        self._profile = None
+
+
+def ParseTurns(s):
+    # Parses a list of turns and ranges of turns such as "1-5,100", or
+    # returns None (all turns) for an empty string.
+    if not s.strip():
+        return None
+    turns = set()
+    for part in s.split(","):
+        first, _, last = part.partition("-")
+        turns.update(range(int(first), int(last or first) + 1))
+    return turns
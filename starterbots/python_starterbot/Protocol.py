@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+
+import os
+import sys
+from time import perf_counter
+
+# The game state of each turn is terminated by a line containing "go".
+GO = b"\ngo\n"
+READ_SIZE = 1 << 16
+# In a session (see tools/engine.py), the engine ends each game with a line
+# containing "end" and starts the next one once the bot has replied "end".
+END = b"\nend\n"
+SESSION_LINE = "# session\n"
+
+
+def SessionOffered():
+    # Whether the engine offers to play several games with this process.
+    return os.environ.get("PLANETWARS_SESSION") == "1"
+
+
+def Turns(stream=None):
+    # Yields the game state of each turn as a string, without the "go" line,
+    # and None at the end of each game of a session.
+    for game_state, _ in TimedTurns(stream):
+        yield game_state
+
+
+def TimedTurns(stream=None):
+    # Like Turns(), but yields (game_state, arrival) pairs, where arrival is
+    # the time.perf_counter() at which the "go" line was read, so that the
+    # time left for the turn can be measured from when the engine sent it.
+    # The input is read in large blocks straight from the file descriptor
+    # rather than line by line, so stream must not be read from elsewhere.
+    if stream is None:
+        stream = sys.stdin.buffer
+    fd = stream.fileno()
+    # The leading newline lets a "go" on the very first line match GO.
+    data = bytearray(b"\n")
+    start = 0
+    arrival = perf_counter()
+    while True:
+        if data.startswith(END):
+            yield None, arrival
+            del data[:len(END) - 1]
+            start = 0
+            continue
+        end = data.find(GO, start)
+        if end < 0:
+            start = max(0, len(data) - len(GO) + 1)
+            chunk = os.read(fd, READ_SIZE)
+            arrival = perf_counter()
+            if not chunk:
+                return
+            data += chunk
+            continue
+        yield data[1:end + 1].decode(), arrival
+        # Keep the newline ending the "go" line as the next leading newline.
+        del data[:end + len(GO) - 1]
+        start = 0
+
+
+def WriteOrders(orders, stream=None):
+    # Sends the given order lines followed by "go" with a single write.
+    if stream is None:
+        stream = sys.stdout.buffer
+    stream.write(("".join(orders) + "go\n").encode())
+    stream.flush()
+
+
+def EndGame(stream=None):
+    # Tells the engine that the bot is ready for the next game of a session.
+    if stream is None:
+        stream = sys.stdout.buffer
+    stream.write(b"end\n")
+    stream.flush()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+
+from collections import OrderedDict
+
+
+class TranspositionTable:
+    # Remembers values, such as evaluations or search results, of the game
+    # states reached during a search, keyed by PlanetWars.Hash(), so that
+    # states reached through different orders are only evaluated once:
+    #
+    #   table = TranspositionTable()
+    #   ...
+    #   score = table.Get(pw.Hash())
+    #   if score is None:
+    #       score = Evaluate(pw)
+    #       table.Put(pw.Hash(), score)
+    #
+    # At most capacity values are kept; when it is full, the least recently
+    # used value is replaced. Hashes of different states may collide, so
+    # rarely a value of another state is returned.
+
+    def __init__(self, capacity=1 << 18):
+        self._capacity = capacity
+        self._values = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def Get(self, key, default=None):
+        value = self._values.get(key, self)
+        if value is self:
+            self._misses += 1
+            return default
+        self._values.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def Put(self, key, value):
+        values = self._values
+        if key in values:
+            values.move_to_end(key)
+        elif len(values) >= self._capacity:
+            values.popitem(last=False)
+        values[key] = value
+
+    def Clear(self):
+        # Forgets every value, for example at the start of a new game.
+        self._values.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def HitRate(self):
+        # The fraction of Get() calls that found a value.
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+#
+
+import os
+import traceback
+from math import ceil
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+
+from PlanetWars import PlanetWars
+
+# Number of turns that SimulatedShips() plays the game ahead for.
+EVALUATION_TURNS = 20
+# Each evaluation is split into about this many chunks per worker, so that
+# workers that finish early take over work and a deadline leaves few
+# candidates unevaluated.
+CHUNKS_PER_WORKER = 4
+# The shared memory holds the state's version and length, then the state as
+# returned by PlanetWars.PackState().
+HEADER_SIZE = 2
+VALUE_SIZE = 8
+
+
+def SimulatedShips(pw, orders):
+    # An example evaluation: the ships that player 1 has more than the other
+    # players once the orders are carried out and the game is played ahead
+    # for EVALUATION_TURNS turns without further orders.
+    pw.Simulate(orders, EVALUATION_TURNS)
+    score = 0
+    for p in pw.Planets():
+        if p.Owner() == 1:
+            score += p.NumShips()
+        elif p.Owner() > 1:
+            score -= p.NumShips()
+    for f in pw.Fleets():
+        score += f.NumShips() if f.Owner() == 1 else -f.NumShips()
+    return score
+
+
+class WorkerPool:
+    # Evaluates candidate orders with worker processes, to use every core the
+    # bot may run on. The workers live for as long as the pool, which is
+    # meant to be made once and used for every turn of every game:
+    #
+    #   pool = WorkerPool(SimulatedShips)
+    #   ...
+    #   pool.Update(pw)
+    #   scores = pool.Evaluate(candidates, pw.TimeRemaining() - 0.1)
+    #
+    # Update() writes the game state to shared memory once per turn, from
+    # which every worker reads it straight into its own PlanetWars object, so
+    # only the candidates and their scores are sent through pipes.
+    # evaluate(pw, orders) is called in the workers with a clone of the game
+    # state and a list of (source_planet, destination_planet, num_ships)
+    # tuples, and returns their score. It must be a function defined at the
+    # top level of a module so that it can be sent to the workers.
+    # If a worker dies, it is replaced, and the candidates it was evaluating
+    # are evaluated in the bot's process instead.
+
+    def __init__(self, evaluate=SimulatedShips, num_workers=None):
+        if num_workers is None:
+            if hasattr(os, "sched_getaffinity"):
+                num_workers = len(os.sched_getaffinity(0))
+            else:
+                num_workers = os.cpu_count() or 1
+        self._evaluate = evaluate
+        self._memory = SharedMemory(create=True, size=VALUE_SIZE * (HEADER_SIZE + 1024))
+        self._values = self._memory.buf.cast("d")
+        self._version = 0
+        self._state = None
+        self._task = 0
+        self._connections = []
+        self._processes = []
+        # The (task, start, candidates) of the chunk that each worker is still
+        # evaluating, possibly for an earlier Evaluate().
+        self._busy = {}
+        for _ in range(num_workers):
+            connection, process = self._StartWorker()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def _StartWorker(self):
+        connection, worker_connection = Pipe()
+        process = Process(target=_Work, args=(worker_connection, self._evaluate), daemon=True)
+        process.start()
+        worker_connection.close()
+        return connection, process
+
+    def _ReplaceWorker(self, connection):
+        # Replaces a worker that died, or only forgets it if no new process
+        # can be started.
+        i = self._connections.index(connection)
+        self._busy.pop(connection, None)
+        connection.close()
+        if self._processes[i].is_alive():
+            self._processes[i].terminate()
+        self._processes[i].join(1)
+        try:
+            self._connections[i], self._processes[i] = self._StartWorker()
+        except OSError:
+            del self._connections[i], self._processes[i]
+
+    def NumWorkers(self):
+        return len(self._processes)
+
+    def Update(self, pw):
+        # Shares the game state of pw with the workers for the next
+        # evaluations.
+        state = pw.PackState()
+        # Kept to evaluate candidates in this process if workers die.
+        self._state = pw.Clone()
+        if HEADER_SIZE + len(state) > len(self._values):
+            self._Resize(2 * (HEADER_SIZE + len(state)))
+        values = self._values
+        self._version += 1
+        # Workers still reading an earlier state see that it changed (see
+        # _ReadState()).
+        values[0] = -1
+        values[1] = len(state)
+        values[HEADER_SIZE:HEADER_SIZE + len(state)] = state
+        values[0] = self._version
+
+    def _Resize(self, size):
+        # Workers attach to the new memory when they are next sent a task,
+        # which names it; the old one is freed once they have all let go.
+        self._values.release()
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = SharedMemory(create=True, size=VALUE_SIZE * size)
+        self._values = self._memory.buf.cast("d")
+
+    def Evaluate(self, candidates, timeout=None):
+        # Returns the score of each candidate in the game state given to
+        # Update(). Candidates that could not be evaluated within timeout
+        # seconds have a score of None. Raises RuntimeError if evaluate
+        # raised an exception in a worker.
+        deadline = None if timeout is None else perf_counter() + timeout
+        self._task += 1
+        task = self._task
+        scores = [None] * len(candidates)
+        chunk_size = max(1, ceil(len(candidates)
+                                 / (CHUNKS_PER_WORKER * max(1, len(self._connections)))))
+        pending = [(start, candidates[start:start + chunk_size])
+                   for start in range(0, len(candidates), chunk_size)]
+        pending.reverse()
+        outstanding = 0
+        while True:
+            outstanding += self._Dispatch(task, pending)
+            if not outstanding and not pending:
+                break
+            if not self._busy:
+                # No worker is left to evaluate the candidates.
+                while pending:
+                    self._EvaluateHere(*pending.pop(), scores, deadline)
+                break
+            timeout = None if deadline is None else deadline - perf_counter()
+            if timeout is not None and timeout <= 0:
+                break
+            for connection in wait(list(self._busy), timeout):
+                chunk_task, start, chunk = self._busy.pop(connection)
+                try:
+                    result_task, start, results, error = connection.recv()
+                except (EOFError, OSError):
+                    # The worker died.
+                    self._ReplaceWorker(connection)
+                    if chunk_task == task:
+                        outstanding -= 1
+                        self._EvaluateHere(start, chunk, scores, deadline)
+                    continue
+                if result_task == task:
+                    outstanding -= 1
+                    if error:
+                        raise RuntimeError("evaluation failed in a worker:\n" + error)
+                    if results is not None:
+                        scores[start:start + len(results)] = results
+        return scores
+
+    def _Dispatch(self, task, pending):
+        # Sends pending chunks to the idle workers and returns how many were
+        # sent.
+        sent = 0
+        for connection in list(self._connections):
+            if not pending:
+                break
+            if connection in self._busy:
+                continue
+            start, chunk = pending[-1]
+            try:
+                connection.send((task, self._memory.name, self._version, start, chunk))
+            except OSError:
+                self._ReplaceWorker(connection)
+                continue
+            pending.pop()
+            self._busy[connection] = (task, start, chunk)
+            sent += 1
+        return sent
+
+    def _EvaluateHere(self, start, candidates, scores, deadline):
+        for i, orders in enumerate(candidates):
+            if deadline is not None and perf_counter() > deadline:
+                return
+            scores[start + i] = self._evaluate(self._state.Clone(), orders)
+
+    def Close(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self._values.release()
+        self._memory.close()
+        self._memory.unlink()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+
+def _ReadState(pw, values, version):
+    # Loads the state of the given version into pw. Returns False if the
+    # memory holds another version, or was being written while it was read,
+    # in which case the task it was wanted for is out of date.
+    if values[0] != version:
+        return False
+    length = int(values[1])
+    pw.UnpackState(values[HEADER_SIZE:HEADER_SIZE + length])
+    return values[0] == version
+
+
+def _Work(connection, evaluate):
+    pw = PlanetWars()
+    memory = None
+    values = None
+    loaded_version = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            # The bot has exited.
+            break
+        if message is None:
+            break
+        task, name, version, start, candidates = message
+        results = None
+        error = None
+        try:
+            if memory is None or memory.name != name:
+                if memory is not None:
+                    values.release()
+                    memory.close()
+                memory = SharedMemory(name)
+                values = memory.buf.cast("d")
+                loaded_version = None
+            if loaded_version != version:
+                loaded_version = version if _ReadState(pw, values, version) else None
+            if loaded_version == version:
+                results = [evaluate(pw.Clone(), orders) for orders in candidates]
+        except Exception:
+            error = traceback.format_exc()
+        connection.send((task, start, results, error))
+    if memory is not None:
+        values.release()
+        memory.close()
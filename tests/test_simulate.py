@@ -0,0 +1,59 @@
+"""Checks of the game simulation of the Python starter bot against the engine.
+
+Run with `python3 -m unittest discover tests` from the root of the package.
+"""
+
+import os
+import sys
+import unittest
+
+import tools.engine
+import tools.map_generator_v2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "starterbots", "python_starterbot"))
+from PlanetWars import PlanetWars
+
+TURNS = 10
+
+
+def _contents(pw: PlanetWars):
+    planets = [(p.Owner(), p.NumShips()) for p in pw.Planets()]
+    fleets = sorted((f.Owner(), f.NumShips(), f.SourcePlanet(), f.DestinationPlanet(),
+                     f.TotalTripLength(), f.TurnsRemaining()) for f in pw.Fleets())
+    return planets, fleets
+
+
+class SimulateTest(unittest.TestCase):
+    def check_orders(self, orders):
+        # simulates the orders of player 1 and compares the result with the engine's
+        game = tools.engine.Game(tools.map_generator_v2.generate_map(0))
+        pw = PlanetWars(game.pov_state(tools.engine.PLAYER_ONE))
+        for order in orders:
+            # the engine reads the orders as a bot sends them (see IssueOrder())
+            game.issue_order(tools.engine.PLAYER_ONE, "%d %d %d" % order)
+        for _ in range(TURNS):
+            game.do_time_step()
+        pw.Simulate(orders, TURNS)
+        expected = PlanetWars(game.pov_state(tools.engine.PLAYER_ONE))
+        self.assertEqual(_contents(expected), _contents(pw))
+        for num_ships in (p.NumShips() for p in pw.Planets()):
+            self.assertIsInstance(num_ships, int)
+
+    def test_fractional_ship_counts_are_truncated(self):
+        pw = PlanetWars(tools.engine.Game(tools.map_generator_v2.generate_map(0))
+                        .pov_state(tools.engine.PLAYER_ONE))
+        source = pw.MyPlanets()[0]
+        self.check_orders([(source.PlanetID(), pw.NotMyPlanets()[0].PlanetID(),
+                            source.NumShips() / 3)])
+
+    def test_orders_to_or_from_missing_planets_are_ignored(self):
+        pw = PlanetWars(tools.engine.Game(tools.map_generator_v2.generate_map(0))
+                        .pov_state(tools.engine.PLAYER_ONE))
+        source = pw.MyPlanets()[0].PlanetID()
+        self.check_orders([(pw.NumPlanets(), 0, 1), (source, pw.NumPlanets(), 1),
+                           (-1, 0, 1), (source, -1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Checks of the game state hash of the Python starter bot.
+
+Run with `python3 -m unittest discover tests` from the root of the package.
+"""
+
+import os
+import random
+import sys
+import unittest
+
+import tools.engine
+import tools.map_generator_v2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "starterbots", "python_starterbot"))
+from PlanetWars import PlanetWars
+
+NUM_MAPS = 10
+TURNS_PER_MAP = 100
+
+
+def _random_states(seed: int):
+    # yield states of random games on seeded maps, and states simulated from them
+    rng = random.Random(seed)
+    for map_seed in range(seed, seed + NUM_MAPS):
+        game = tools.engine.Game(tools.map_generator_v2.generate_map(map_seed))
+        for _ in range(TURNS_PER_MAP):
+            for player in tools.engine.PLAYERS:
+                sources = [p for p in game.planets if p.owner == player and p.num_ships > 1]
+                if sources:
+                    source = rng.choice(sources)
+                    destination = rng.randrange(len(game.planets))
+                    if destination != source.planet_id:
+                        game.issue_order(
+                            player, f"{source.planet_id} {destination} {source.num_ships // 2}")
+            game.do_time_step()
+            if game.winner() is not None:
+                break
+            pw = PlanetWars(game.pov_state(tools.engine.PLAYER_ONE))
+            pw.Hash()
+            yield pw
+            simulated = pw.Clone()
+            orders = [(p.PlanetID(), rng.randrange(pw.NumPlanets()), p.NumShips() // 2)
+                      for p in pw.Planets() if p.Owner() != 0]
+            simulated.Simulate(orders, rng.randrange(1, 30))
+            yield simulated
+
+
+def _contents(pw: PlanetWars):
+    planets = tuple((p.Owner(), p.NumShips()) for p in pw.Planets())
+    fleets = sorted((f.Owner(), f.NumShips(), f.SourcePlanet(), f.DestinationPlanet(),
+                     f.TotalTripLength(), f.TurnsRemaining()) for f in pw.Fleets())
+    return pw.NumPlanets(), pw.Planets()[0].X(), planets, tuple(fleets)
+
+
+class StateHashTest(unittest.TestCase):
+    def test_incremental_hash_matches_full_hash(self):
+        for pw in _random_states(0):
+            incremental = pw.Hash()
+            pw.Rehash()
+            self.assertEqual(incremental, pw.Hash())
+
+    def test_fractional_orders_keep_the_hash_up_to_date(self):
+        # the starter bot sends half of a planet's ships, which can be a fraction
+        for pw in _random_states(300):
+            pw = pw.Clone()
+            orders = [(p.PlanetID(), (p.PlanetID() + 1) % pw.NumPlanets(), p.NumShips() / 2)
+                      for p in pw.Planets() if p.Owner() != 0]
+            pw.Simulate(orders, 5)
+            incremental = pw.Hash()
+            pw.Rehash()
+            self.assertEqual(incremental, pw.Hash())
+
+    def test_no_collisions(self):
+        states = {}
+        for pw in _random_states(100):
+            contents = _contents(pw)
+            other = states.setdefault(pw.Hash(), contents)
+            self.assertEqual(other, contents, "different states have the same hash")
+        self.assertGreater(len(states), 1000)
+
+    def test_transpositions_have_the_same_hash(self):
+        pw = next(_random_states(200))
+        once = pw.Clone()
+        once.Simulate((), 3)
+        twice = pw.Clone()
+        twice.Simulate((), 1)
+        twice.Simulate((), 2)
+        self.assertEqual(once.Hash(), twice.Hash())
+        self.assertNotEqual(once.Hash(), pw.Hash())
+
+
+if __name__ == "__main__":
+    unittest.main()
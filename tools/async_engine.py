@@ -0,0 +1,167 @@
+"""Play many games concurrently from a single process with asyncio.
+
+`tools/engine.py` waits for each bot on a thread and runs one game per process,
+which is wasteful when most of the time is spent waiting for the bots. Here the
+bots' pipes are read by one event loop instead, so a single process can referee
+hundreds of games at once. The rules, the forfeits and the results are those of
+`tools.engine.Game`, whose state is reused as is.
+"""
+
+import asyncio
+import os
+import shlex
+import subprocess
+import time
+
+import tools.engine
+import tools.replay
+from tools.engine import PLAYER_ONE, PLAYER_TWO
+
+
+class AsyncBot:
+    """A bot process driven by the event loop; create it with `AsyncBot.start`."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.started = time.perf_counter()
+
+    @classmethod
+    async def start(cls, command: str, player: int = None):
+        env = dict(os.environ)
+        if player is not None:
+            env["PLANETWARS_PLAYER"] = str(player)
+        process = await asyncio.create_subprocess_exec(
+            *shlex.split(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, env=env
+        )
+        return cls(process)
+
+    def send(self, data: str) -> bool:
+        # the states are small enough for the pipe's buffer, so they are not drained
+        if self.process.stdin.is_closing():
+            return False
+        try:
+            self.process.stdin.write(data.encode())
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        return True
+
+    async def _read_orders(self):
+        orders = []
+        breakdown = None
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                return None
+            received = time.perf_counter()
+            line = line.decode(errors="replace").strip()
+            if line == "go":
+                return orders, received, breakdown
+            if line.startswith("#"):
+                breakdown = tools.engine.parse_timing_report(line) or breakdown
+            elif line:
+                orders.append(line)
+
+    async def read_orders(self, deadline: float):
+        """Read the bot's orders for the turn, as `tools.engine.Bot.read_orders` does."""
+        try:
+            return await asyncio.wait_for(
+                self._read_orders(), max(0.0, deadline - time.perf_counter()))
+        except (asyncio.TimeoutError, ValueError):
+            # ValueError is raised for lines longer than the stream's limit
+            return None
+
+    async def kill(self):
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        await self.process.wait()
+
+
+async def play(game: tools.engine.Game, player_one: str, player_two: str,
+               replay_filename: str = "") -> tools.engine.GameResult:
+    """Play `game` between the bots started by the two commands, like `Game.play`."""
+    bots = {PLAYER_ONE: await AsyncBot.start(player_one, PLAYER_ONE)}
+    try:
+        bots[PLAYER_TWO] = await AsyncBot.start(player_two, PLAYER_TWO)
+    except BaseException:
+        await bots[PLAYER_ONE].kill()
+        raise
+    if replay_filename:
+        game.replay = tools.replay.ReplayWriter(replay_filename, game.planets)
+    errors = {}
+    timings = {player: [] for player in bots}
+    winner = None
+    try:
+        await asyncio.sleep(tools.engine.startup_delay(bots.values()))
+        winner = game.winner()
+        while winner is None:
+            sent = {}
+            for player, bot in bots.items():
+                sent[player] = time.perf_counter()
+                if not bot.send(game.pov_state(player)):
+                    errors[player] = "crashed"
+
+            # both bots think at the same time, so they are read concurrently
+            deadline = time.perf_counter() + game.turn_time() / 1000
+            reading = [player for player in bots if player not in errors]
+            responses = await asyncio.gather(
+                *(bots[player].read_orders(deadline) for player in reading))
+            for player, response in zip(reading, responses):
+                game.handle_response(player, response, sent[player], timings, errors)
+
+            if errors:
+                winner = tools.engine.forfeit_winner(errors)
+                break
+
+            game.do_time_step()
+            winner = game.winner()
+    finally:
+        await asyncio.gather(*(bot.kill() for bot in bots.values()))
+        if game.replay:
+            game.replay.write_result(tools.engine.NEUTRAL if winner is None else winner, game.turn)
+            game.replay.close()
+            game.replay = None
+
+    return tools.engine.GameResult(winner, game.turn, errors, game.playback, timings)
+
+
+async def _play_limited(semaphore: asyncio.Semaphore, key, map_data: str, player_one: str,
+                        player_two: str, max_turn_time: int, max_num_turns: int,
+                        replay_filename: str):
+    async with semaphore:
+        game = tools.engine.Game(map_data, max_turn_time, max_num_turns)
+        return key, await play(game, player_one, player_two, replay_filename)
+
+
+def play_games(games, concurrency: int = 100, max_turn_time: int = 1000,
+               max_num_turns: int = 200):
+    """Play games concurrently and yield (key, `GameResult`) as each game ends.
+
+    `games` holds (key, map data, player one, player two, replay filename) tuples,
+    and at most `concurrency` of them are played at once. Games still being played
+    are stopped when the generator is closed.
+    """
+    loop = asyncio.new_event_loop()
+    pending = set()
+    try:
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = {
+            loop.create_task(_play_limited(semaphore, key, map_data, player_one, player_two,
+                                           max_turn_time, max_num_turns, replay_filename))
+            for key, map_data, player_one, player_two, replay_filename in games
+        }
+        while pending:
+            done, pending = loop.run_until_complete(
+                asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            # let the cancelled games kill their bots
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
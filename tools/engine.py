@@ -0,0 +1,522 @@
+"""In-process Planet Wars game engine.
+
+This is a Python replacement for `tools/PlayGame-1.2.jar`. The turn resolution
+(departure, advancement and arrival) follows `SPECIFICATION.md` and the bots are
+driven over pipes exactly like the Java engine does.
+
+Bots can opt in to a session extension of the protocol that lets one process
+play many games. A bot announces it by sending the comment line "# session"
+with its orders, which it should only do when it is started with the environment
+variable PLANETWARS_SESSION set to 1. When a game ends, the engine then sends the line "end" to each
+such bot instead of killing it, and waits for the bot to reply with "end" once
+it is ready for the state of a new game. A `BotPool` keeps those processes
+around between games and starts a new process for any other bot.
+
+Every bot is started with the environment variable PLANETWARS_PLAYER set to the
+player it plays as, since the game states it is sent do not tell it.
+"""
+
+import math
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+
+import tools.replay
+
+NEUTRAL = 0
+PLAYER_ONE = 1
+PLAYER_TWO = 2
+PLAYERS = (PLAYER_ONE, PLAYER_TWO)
+
+# time (in ms) given to the bots between their launch and the first game state to
+# let their interpreters or virtual machines warm up, as described in the
+# specification
+STARTUP_TIME = 2000
+
+# comment line with which a bot announces that it supports sessions and the line
+# that ends a game in a session
+SESSION_LINE = "# session"
+END_LINE = "end"
+
+
+class Planet:
+    __slots__ = ("planet_id", "x", "y", "owner", "num_ships", "growth_rate")
+
+    def __init__(self, planet_id, x, y, owner, num_ships, growth_rate):
+        self.planet_id = planet_id
+        self.x = x
+        self.y = y
+        self.owner = owner
+        self.num_ships = num_ships
+        self.growth_rate = growth_rate
+
+
+class Fleet:
+    __slots__ = ("owner", "num_ships", "source", "destination", "total_trip_length",
+                 "turns_remaining")
+
+    def __init__(self, owner, num_ships, source, destination, total_trip_length,
+                 turns_remaining):
+        self.owner = owner
+        self.num_ships = num_ships
+        self.source = source
+        self.destination = destination
+        self.total_trip_length = total_trip_length
+        self.turns_remaining = turns_remaining
+
+
+def parse_map(map_data: str) -> list:
+    planets = []
+    for line in map_data.split("\n"):
+        tokens = line.split("#")[0].split()
+        if not tokens:
+            continue
+        if tokens[0] != "P" or len(tokens) != 6:
+            raise ValueError(f"Invalid map line: \"{line}\".")
+        planets.append(Planet(len(planets), float(tokens[1]), float(tokens[2]),
+                              int(tokens[3]), int(tokens[4]), int(tokens[5])))
+    return planets
+
+
+def distance(p1: Planet, p2: Planet) -> int:
+    dx = p1.x - p2.x
+    dy = p1.y - p2.y
+    return int(math.ceil(math.sqrt(dx * dx + dy * dy)))
+
+
+def pov_owner(owner: int, player: int) -> int:
+    """Return `owner` as seen by `player`, who always sees themselves as player 1."""
+    if player == PLAYER_TWO and owner != NEUTRAL:
+        return 3 - owner
+    return owner
+
+
+def resolve_battle(owner: int, num_ships: int, forces: dict) -> tuple:
+    """Return the (owner, num_ships) of a planet after the arriving `forces` fight.
+
+    `forces` maps each owner to the total number of ships arriving; the planet's
+    own garrison is added to it here.
+    """
+    forces[owner] = forces.get(owner, 0) + num_ships
+    ranked = sorted(forces.items(), key=lambda item: item[1], reverse=True)
+    if len(ranked) == 1:
+        return ranked[0]
+    (first_owner, first_ships), (_, second_ships) = ranked[0], ranked[1]
+    if first_ships == second_ships:
+        return owner, 0
+    return first_owner, first_ships - second_ships
+
+
+@dataclass
+class TurnTiming:
+    turn: int
+    # wall-clock time (in ms) from sending the game state to receiving "go"
+    latency: float
+    # the time (in ms) that the bot was allowed for the turn
+    budget: float
+    # breakdown (in ms) reported by bots that opt in with a "# timing" line
+    parse: float = None
+    think: float = None
+    write: float = None
+
+
+@dataclass
+class GameResult:
+    # 0 for a draw, otherwise the winning player
+    winner: int
+    turns: int
+    # per-player reasons for forfeiting the game, if any
+    errors: dict = field(default_factory=dict)
+    playback: str = ""
+    # per-player list of `TurnTiming`s
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def verdict(self) -> str:
+        """The verdict line in the same format as printed by the Java engine."""
+        if self.winner == NEUTRAL:
+            return "Draw!"
+        return f"Player {self.winner} Wins!"
+
+
+def parse_timing_report(line: str):
+    """Parse a "# timing <parse> <think> <previous write>" line sent by a bot."""
+    tokens = line[1:].split()
+    if len(tokens) != 4 or tokens[0] != "timing":
+        return None
+    try:
+        return tuple(float(token) for token in tokens[1:])
+    except ValueError:
+        return None
+
+
+class Bot:
+    """A bot process that the engine talks to over its standard streams."""
+
+    def __init__(self, command: str, cpus=None, session: bool = False, player: int = None):
+        self.command = command
+        self.player = player
+        # when the process was launched, from which its startup time is counted
+        self.started = time.perf_counter()
+        env = dict(os.environ)
+        if player is not None:
+            env["PLANETWARS_PLAYER"] = str(player)
+        # bots are only offered sessions when the engine will end their games with
+        # the end line rather than by killing them
+        if session:
+            env["PLANETWARS_SESSION"] = "1"
+        # the CPUs are set in the child before it runs the bot, so that every thread
+        # the bot's runtime starts is pinned too
+        preexec_fn = None
+        if cpus and hasattr(os, "sched_setaffinity"):
+            preexec_fn = lambda: os.sched_setaffinity(0, cpus)
+        self.process = subprocess.Popen(
+            shlex.split(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, bufsize=0, env=env, preexec_fn=preexec_fn
+        )
+        # whether the bot announced that it supports sessions
+        self.session = False
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(target=self._read_lines, daemon=True)
+        self._reader.start()
+
+    def _read_lines(self):
+        for line in self.process.stdout:
+            self._lines.put((line.decode(errors="replace").strip(), time.perf_counter()))
+        self._lines.put(None)
+
+    def pin(self, cpus):
+        """Pin the running bot, with all its threads, to a set of CPUs."""
+        if not cpus or not hasattr(os, "sched_setaffinity"):
+            return
+        # the affinity of a process is that of each of its threads
+        try:
+            threads = [int(tid) for tid in os.listdir(f"/proc/{self.process.pid}/task")]
+        except OSError:
+            threads = [self.process.pid]
+        for thread in threads:
+            try:
+                os.sched_setaffinity(thread, cpus)
+            except ProcessLookupError:
+                pass
+
+    def send(self, data: str) -> bool:
+        try:
+            self.process.stdin.write(data.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return False
+        return True
+
+    def read_orders(self, deadline: float):
+        """Read the bot's orders for the turn.
+
+        Return the lines sent before "go", the time at which "go" was received and the
+        timing breakdown reported by the bot (or None), or None if the bot timed out
+        or crashed.
+        """
+        orders = []
+        breakdown = None
+        while True:
+            try:
+                item = self._lines.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                return None
+            if item is None:
+                return None
+            line, received = item
+            if line == "go":
+                return orders, received, breakdown
+            if line == SESSION_LINE:
+                self.session = True
+            elif line.startswith("#"):
+                breakdown = parse_timing_report(line) or breakdown
+            elif line:
+                orders.append(line)
+
+    def end_game(self, timeout: float) -> bool:
+        """End the game of a bot in a session.
+
+        Return whether the bot acknowledged the end of the game within `timeout`
+        seconds, after which it is ready to play another game. Anything the bot sent
+        before the acknowledgement (such as orders for a turn that was never played)
+        is discarded.
+        """
+        if not self.session or not self.send(END_LINE + "\n"):
+            return False
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                item = self._lines.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                return False
+            if item is None:
+                return False
+            if item[0] == END_LINE:
+                return True
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class BotPool:
+    """Bot processes that are kept alive between games.
+
+    Bots that support sessions are handed back out to later games with the same
+    command and player; every other bot is killed at the end of its game, so that it falls
+    back to one process per game.
+    """
+
+    def __init__(self):
+        self._idle = {}
+
+    def acquire(self, command: str, cpus=None, player: int = None) -> Bot:
+        idle = self._idle.get((command, player))
+        if idle:
+            bot = idle.pop()
+            bot.pin(cpus)
+            return bot
+        return Bot(command, cpus, session=True, player=player)
+
+    def release(self, bot: Bot, reusable: bool = True, timeout: float = 1.0):
+        """Return a bot at the end of its game; it is kept if `reusable` and it can end the game."""
+        if reusable and bot.end_game(timeout):
+            self._idle.setdefault((bot.command, bot.player), []).append(bot)
+        else:
+            bot.kill()
+
+    def close(self):
+        for idle in self._idle.values():
+            for bot in idle:
+                bot.kill()
+        self._idle.clear()
+
+
+class Game:
+    def __init__(self, map_data: str, max_turn_time: int = 1000, max_num_turns: int = 200):
+        self.planets = parse_map(map_data)
+        self.fleets = []
+        self.max_turn_time = max_turn_time
+        self.max_num_turns = max_num_turns
+        self.turn = 0
+        self._distances = [[distance(p1, p2) for p2 in self.planets] for p1 in self.planets]
+        self._playback_planets = ":".join(
+            f"{p.x!r},{p.y!r},{p.owner},{p.num_ships},{p.growth_rate}" for p in self.planets)
+        self._playback_turns = []
+        # fleets launched during the current turn and the optional replay they are
+        # recorded to
+        self._launches = []
+        self.replay = None
+
+    def pov_state(self, player: int) -> str:
+        """Return the game state as it is sent to `player`, terminated by "go"."""
+        lines = [f"P {p.x!r} {p.y!r} {pov_owner(p.owner, player)} {p.num_ships} {p.growth_rate}"
+                 for p in self.planets]
+        lines.extend(
+            f"F {pov_owner(f.owner, player)} {f.num_ships} {f.source} {f.destination} "
+            f"{f.total_trip_length} {f.turns_remaining}" for f in self.fleets)
+        lines.append("go\n")
+        return "\n".join(lines)
+
+    def issue_order(self, player: int, order: str) -> str:
+        """Carry out the departure of a single order; return an error message if it is invalid."""
+        try:
+            source, destination, num_ships = map(int, order.split())
+        except ValueError:
+            return f"invalid order \"{order}\""
+        if not (0 <= source < len(self.planets) and 0 <= destination < len(self.planets)):
+            return f"order \"{order}\" refers to a planet that does not exist"
+        if source == destination:
+            return f"order \"{order}\" has the same source and destination"
+        planet = self.planets[source]
+        if planet.owner != player:
+            return f"order \"{order}\" is from a planet the player does not own"
+        if not 0 <= num_ships <= planet.num_ships:
+            return f"order \"{order}\" sends an invalid number of ships"
+        if num_ships:
+            planet.num_ships -= num_ships
+            trip_length = self._distances[source][destination]
+            fleet = Fleet(player, num_ships, source, destination, trip_length, trip_length)
+            self.fleets.append(fleet)
+            self._launches.append(fleet)
+        return ""
+
+    def do_time_step(self):
+        """Advance the game state by the advancement and arrival phases."""
+        for p in self.planets:
+            if p.owner != NEUTRAL:
+                p.num_ships += p.growth_rate
+
+        arrivals = {}
+        in_flight = []
+        for f in self.fleets:
+            f.turns_remaining -= 1
+            if f.turns_remaining > 0:
+                in_flight.append(f)
+                continue
+            forces = arrivals.setdefault(f.destination, {})
+            forces[f.owner] = forces.get(f.owner, 0) + f.num_ships
+        self.fleets = in_flight
+
+        for planet_id, forces in arrivals.items():
+            p = self.planets[planet_id]
+            p.owner, p.num_ships = resolve_battle(p.owner, p.num_ships, forces)
+
+        self.turn += 1
+        self._record_playback()
+        if self.replay:
+            self.replay.write_turn(self.planets, self._launches)
+        self._launches = []
+
+    def _record_playback(self):
+        frame = [f"{p.owner}.{p.num_ships}" for p in self.planets]
+        frame.extend(
+            f"{f.owner}.{f.num_ships}.{f.source}.{f.destination}."
+            f"{f.total_trip_length}.{f.turns_remaining}" for f in self.fleets)
+        self._playback_turns.append(",".join(frame))
+
+    @property
+    def playback(self) -> str:
+        """The playback string read by `visualizer/visualize_locally.py`."""
+        return self._playback_planets + "|" + ":".join(self._playback_turns)
+
+    def num_ships(self, player: int) -> int:
+        return (sum(p.num_ships for p in self.planets if p.owner == player)
+                + sum(f.num_ships for f in self.fleets if f.owner == player))
+
+    def is_alive(self, player: int) -> bool:
+        return (any(p.owner == player for p in self.planets)
+                or any(f.owner == player for f in self.fleets))
+
+    def winner(self):
+        """Return the winner (0 for a draw) if the game is over, otherwise None."""
+        alive = [player for player in PLAYERS if self.is_alive(player)]
+        if self.turn >= self.max_num_turns:
+            ships = [self.num_ships(player) for player in PLAYERS]
+            if ships[0] == ships[1]:
+                return NEUTRAL
+            return PLAYER_ONE if ships[0] > ships[1] else PLAYER_TWO
+        if len(alive) == 2:
+            return None
+        return alive[0] if alive else NEUTRAL
+
+    def turn_time(self) -> int:
+        """Return the time (in ms) that the bots have for the current turn."""
+        return self.max_turn_time
+
+    def handle_response(self, player: int, response, sent: float, timings: dict, errors: dict,
+                        log=None):
+        """Record the timing of a bot's response to the current turn and issue its orders.
+
+        `response` is as returned by `Bot.read_orders` and `sent` is the time at which
+        the bot was sent the game state. Any reason for the bot to forfeit the game is
+        added to `errors`.
+        """
+        turn_time = self.turn_time()
+        if response is None:
+            errors[player] = "timed out or crashed"
+            timings[player].append(TurnTiming(
+                self.turn + 1, 1000 * (time.perf_counter() - sent), turn_time))
+            return
+        orders, received, breakdown = response
+        timing = TurnTiming(self.turn + 1, 1000 * (received - sent), turn_time)
+        if breakdown:
+            timing.parse, timing.think, previous_write = breakdown
+            if timings[player]:
+                timings[player][-1].write = previous_write
+        timings[player].append(timing)
+        for order in orders:
+            if log:
+                log.write(f"player{player} > engine: {order}\n")
+            error = self.issue_order(player, order)
+            if error:
+                errors[player] = error
+                break
+
+    def play(self, player_one: str, player_two: str, log_filename: str = "",
+             cpus=None, replay_filename: str = "", bot_pool: BotPool = None) -> GameResult:
+        """Play the game between the bots started by the two commands.
+
+        `cpus` optionally gives a set of CPUs for each bot to be pinned to, where the
+        platform supports it. If `replay_filename` is given, the game is recorded to it
+        as it is played in the format of `tools/replay.py`. If `bot_pool` is given, the
+        bots are taken from it and returned to it after the game. Bots launched for the
+        game are given `STARTUP_TIME` before they are sent the first game state.
+        """
+        cpus = cpus or (None, None)
+        start = bot_pool.acquire if bot_pool else Bot
+        bots = {PLAYER_ONE: start(player_one, cpus[0], player=PLAYER_ONE),
+                PLAYER_TWO: start(player_two, cpus[1], player=PLAYER_TWO)}
+        log = open(log_filename, "w+") if log_filename else None
+        if replay_filename:
+            self.replay = tools.replay.ReplayWriter(replay_filename, self.planets)
+        errors = {}
+        timings = {player: [] for player in bots}
+        winner = None
+        try:
+            time.sleep(startup_delay(bots.values()))
+            winner = self.winner()
+            while winner is None:
+                sent = {}
+                for player, bot in bots.items():
+                    state = self.pov_state(player)
+                    if log:
+                        log.write(f"engine > player{player}: {state}")
+                    sent[player] = time.perf_counter()
+                    if not bot.send(state):
+                        errors[player] = "crashed"
+
+                deadline = time.perf_counter() + self.turn_time() / 1000
+                for player, bot in bots.items():
+                    if player not in errors:
+                        self.handle_response(player, bot.read_orders(deadline), sent[player],
+                                             timings, errors, log)
+
+                if errors:
+                    winner = forfeit_winner(errors)
+                    break
+
+                self.do_time_step()
+                winner = self.winner()
+        finally:
+            for player, bot in bots.items():
+                if bot_pool:
+                    # bots that failed may be in any state, so they are never reused
+                    bot_pool.release(bot, winner is not None and player not in errors,
+                                     self.max_turn_time / 1000)
+                else:
+                    bot.kill()
+            if log:
+                log.close()
+            if self.replay:
+                self.replay.write_result(NEUTRAL if winner is None else winner, self.turn)
+                self.replay.close()
+                self.replay = None
+
+        return GameResult(winner, self.turn, errors, self.playback, timings)
+
+
+def startup_delay(bots) -> float:
+    """Return the time (in seconds) left before every bot has had its startup time."""
+    return max(0.0, max(bot.started for bot in bots) + STARTUP_TIME / 1000 - time.perf_counter())
+
+
+def forfeit_winner(errors: dict) -> int:
+    """Return the winner of a game in which the players in `errors` forfeited."""
+    if len(errors) == 2:
+        return NEUTRAL
+    return PLAYER_TWO if PLAYER_ONE in errors else PLAYER_ONE
+
+
+def play_game(map_path: str, max_turn_time: int, max_num_turns: int, player_one: str,
+              player_two: str, log_filename: str = "", cpus=None,
+              replay_filename: str = "", bot_pool: BotPool = None) -> GameResult:
+    with open(map_path) as map_file:
+        game = Game(map_file.read(), max_turn_time, max_num_turns)
+    return game.play(player_one, player_two, log_filename, cpus, replay_filename, bot_pool)
@@ -1,6 +1,9 @@
 #!/usr/bin/python
 
+import argparse
 import math
+import multiprocessing
+import os
 import random
 
 # minimum and maximum total number of planets in map
@@ -55,14 +58,14 @@ def generate_coordinates(p, r, theta):
     p["y"] = r * math.sin(math.radians(theta))
 
 
-def rand_num(minimum, maximum):
-    return (random.random() * (maximum - minimum)) + minimum
+def rand_num(minimum, maximum, rng=random):
+    return (rng.random() * (maximum - minimum)) + minimum
 
 
-def rand_radius(min_r, max_r):
+def rand_radius(min_r, max_r, rng=random):
     val = min_r - 1
     while val < min_r:
-        val = math.sqrt(random.random()) * max_r
+        val = math.sqrt(rng.random()) * max_r
     return val
 
 
@@ -76,33 +79,42 @@ def actual_distance(p1, p2):
     return math.sqrt(dx * dx + dy * dy)
 
 
-def not_valid(p1, p2, planets):
-    a_distance = actual_distance(p1, p2)
-    if distance(p1, p2) < minDistance or abs(a_distance - round(a_distance)) < epsilon:
-        return True
+def conflicts(x, y, planets):
+    # whether a planet at (x, y) would be too close to any of `planets`, or at a
+    # distance from one of them that is too close to an integer
+    sqrt = math.sqrt
+    # ceil(distance) < minDistance exactly when distance <= minDistance - 1
+    max_squared = (minDistance - 1) ** 2
     for p in planets:
-        a_distance1 = actual_distance(p, p1)
-        a_distance2 = actual_distance(p, p2)
-        if (distance(p, p1) < minDistance
-                or distance(p, p2) < minDistance
-                or abs(a_distance1 - round(a_distance1)) < epsilon
-                or abs(a_distance2 - round(a_distance2)) < epsilon):
+        dx = p["x"] - x
+        dy = p["y"] - y
+        squared = dx * dx + dy * dy
+        if squared <= max_squared:
+            return True
+        a_distance = sqrt(squared)
+        if abs(a_distance - round(a_distance)) < epsilon:
             return True
     return False
 
 
+def not_valid(p1, p2, planets):
+    return (conflicts(p1["x"], p1["y"], (p2,))
+            or conflicts(p1["x"], p1["y"], planets)
+            or conflicts(p2["x"], p2["y"], planets))
+
+
 def not_valids(p1, planets):
-    for p in planets:
-        a_distance = actual_distance(p, p1)
-        if distance(p, p1) < minDistance or abs(a_distance - round(a_distance)) < epsilon:
-            return True
-    return False
+    return conflicts(p1["x"], p1["y"], planets)
+
 
+def generate_map(seed=None):
+    # maps are reproducible from their seed; without one the global random state
+    # is used
+    rng = random if seed is None else random.Random(seed)
 
-def generate_map():
     # works out information about the map
-    planets_to_generate = random.randint(minPlanets, maxPlanets)
-    if random.randint(0, 1):
+    planets_to_generate = rng.randint(minPlanets, maxPlanets)
+    if rng.randint(0, 1):
         symmetry_type = 1  # radial symmetry
         # can only generate an odd number of planets in this symmetry
         while planets_to_generate % 2 == 0:
@@ -113,21 +125,21 @@ def generate_map():
     else:
         symmetry_type = -1  # linear symmetry
 
-    planets = [make_planet(0, 0, 0, random.randint(minShips, maxShips),
-                           random.randint(0, maxGrowth))]
+    planets = [make_planet(0, 0, 0, rng.randint(minShips, maxShips),
+                           rng.randint(0, maxGrowth))]
 
     # adds the centre planet
     planets_to_generate -= 1
 
     # picks out the home planets
-    r = rand_radius(minDistance, maxRadius)
-    theta1 = rand_num(0, 360)
+    r = rand_radius(minDistance, maxRadius, rng)
+    theta1 = rand_num(0, 360, rng)
     if symmetry_type == 1 and theta1 < 180:
         theta2 = theta1 + 180
     elif symmetry_type == 1:
         theta2 = theta1 - 180
     else:
-        theta2 = rand_num(0, 360)
+        theta2 = rand_num(0, 360, rng)
 
     p1 = make_planet(0, 0, 1, 100, 5)
     p2 = make_planet(0, 0, 2, 100, 5)
@@ -135,14 +147,14 @@ def generate_map():
     generate_coordinates(p2, r, theta2)
 
     while not_valid(p1, p2, planets) or distance(p1, p2) < minStartingDistance:
-        r = rand_radius(minDistance, maxRadius)
-        theta1 = rand_num(0, 360)
+        r = rand_radius(minDistance, maxRadius, rng)
+        theta1 = rand_num(0, 360, rng)
         if symmetry_type == 1 and theta1 < 180:
             theta2 = theta1 + 180
         elif symmetry_type == 1:
             theta2 = theta1 - 180
         else:
-            theta2 = rand_num(0, 360)
+            theta2 = rand_num(0, 360, rng)
 
         generate_coordinates(p1, r, theta1)
         generate_coordinates(p2, r, theta2)
@@ -152,19 +164,19 @@ def generate_map():
 
     # makes the center neutral planets
     if symmetry_type == 1:
-        no_center_neutrals = 2 * random.randint(0, maxCentral // 2)
+        no_center_neutrals = 2 * rng.randint(0, maxCentral // 2)
         theta_a = (theta1 + theta2) / 2
         theta_b = theta_a + 180
         for i in range(no_center_neutrals // 2):
-            r = rand_radius(minDistance, maxRadius)
-            num_ships = random.randint(minShips, maxShips)
-            growth_rate = random.randint(minGrowth, maxGrowth)
+            r = rand_radius(minDistance, maxRadius, rng)
+            num_ships = rng.randint(minShips, maxShips)
+            growth_rate = rng.randint(minGrowth, maxGrowth)
             p1 = make_planet(0, 0, 0, num_ships, growth_rate)
             p2 = make_planet(0, 0, 0, num_ships, growth_rate)
             generate_coordinates(p1, r, theta_a)
             generate_coordinates(p2, r, theta_b)
             while not_valid(p1, p2, planets):
-                r = rand_radius(minDistance, maxRadius)
+                r = rand_radius(minDistance, maxRadius, rng)
                 generate_coordinates(p1, r, theta_a)
                 generate_coordinates(p2, r, theta_b)
             planets.append(p1)
@@ -173,18 +185,18 @@ def generate_map():
     else:
         # must have an even number of planets left to generate after this
         min_central = planets_to_generate % 2
-        no_center_neutrals = random.randrange(min_central, maxCentral + 1, 2)
+        no_center_neutrals = rng.randrange(min_central, maxCentral + 1, 2)
         theta = (theta1 + theta2) / 2
-        if random.randint(0, 1) == 1:
+        if rng.randint(0, 1) == 1:
             theta += 180
         for i in range(no_center_neutrals):
-            r = rand_radius(0, maxRadius)
-            num_ships = random.randint(minShips, maxShips)
-            growth_rate = random.randint(minGrowth, maxGrowth)
+            r = rand_radius(0, maxRadius, rng)
+            num_ships = rng.randint(minShips, maxShips)
+            growth_rate = rng.randint(minGrowth, maxGrowth)
             p = make_planet(0, 0, 0, num_ships, growth_rate)
             generate_coordinates(p, r, theta)
             while not_valids(p, planets):
-                r = rand_radius(0, maxRadius)
+                r = rand_radius(0, maxRadius, rng)
                 generate_coordinates(p, r, theta)
             planets.append(p)
             planets_to_generate -= 1
@@ -192,22 +204,22 @@ def generate_map():
     # picks out the rest of the neutral planets
     assert planets_to_generate % 2 == 0, "Error: odd number of planets left to add"
     for i in range(planets_to_generate // 2):
-        r = rand_radius(minDistance, maxRadius)
-        theta = rand_num(0, 360)
+        r = rand_radius(minDistance, maxRadius, rng)
+        theta = rand_num(0, 360, rng)
         if i == 0:
             planet_max = min(100, 5 * distance(planets[1], planets[2]) - 1)
-            num_ships = random.randint(minShips, planet_max)
+            num_ships = rng.randint(minShips, planet_max)
         else:
-            num_ships = random.randint(minShips, maxShips)
-        growth_rate = random.randint(minGrowth, maxGrowth)
+            num_ships = rng.randint(minShips, maxShips)
+        growth_rate = rng.randint(minGrowth, maxGrowth)
         p1 = make_planet(0, 0, 0, num_ships, growth_rate)
         p2 = make_planet(0, 0, 0, num_ships, growth_rate)
         generate_coordinates(p1, r, theta1 + theta)
         generate_coordinates(p2, r, theta2 + symmetry_type * theta)
 
         while not_valid(p1, p2, planets):
-            r = rand_radius(minDistance, maxRadius)
-            theta = rand_num(0, 360)
+            r = rand_radius(minDistance, maxRadius, rng)
+            theta = rand_num(0, 360, rng)
             generate_coordinates(p1, r, theta1 + theta)
             generate_coordinates(p2, r, theta2 + symmetry_type * theta)
         planets.append(p1)
@@ -218,11 +230,41 @@ def generate_map():
     return "\n".join(map(print_planet, planets))
 
 
-def save_map(f="generated.txt"):
+def save_map(f="generated.txt", seed=None):
     file_object = open(f, "w+")
-    file_object.write(generate_map())
+    file_object.write(generate_map(seed))
     file_object.close()
 
 
+def generate_maps(count, seed=0, processes=None):
+    # generates `count` maps in parallel, where map i is generated from seed
+    # `seed + i` and is the same as `generate_map(seed + i)`
+    seeds = range(seed, seed + count)
+    if processes == 1:
+        return [generate_map(s) for s in seeds]
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, count // (4 * (os.cpu_count() or 1)))
+        return pool.map(generate_map, seeds, chunksize=chunksize)
+
+
 if __name__ == "__main__":
-    print(generate_map())
+    parser = argparse.ArgumentParser(description="Generate Planet Wars maps.")
+    parser.add_argument(
+        "--seed", action="store", default=None, type=int,
+        help="seed of the (first) map to generate.", dest="seed")
+    parser.add_argument(
+        "--count", action="store", default=None, type=int,
+        help="number of maps to generate into `output_dir`.", dest="count")
+    parser.add_argument(
+        "--output_dir", action="store", default="maps", type=str,
+        help="directory to save the generated maps to, named after their seeds.",
+        dest="output_dir")
+    arguments = parser.parse_args()
+
+    if arguments.count is None:
+        print(generate_map(arguments.seed))
+    else:
+        first_seed = arguments.seed or 0
+        for map_seed, map_data in enumerate(generate_maps(arguments.count, first_seed), first_seed):
+            with open(os.path.join(arguments.output_dir, f"seed{map_seed}.txt"), "w") as map_file:
+                map_file.write(map_data)
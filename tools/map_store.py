@@ -0,0 +1,337 @@
+"""Corpus of maps stored in a single file together with their features.
+
+Every map is stored once with features computed when it is added:
+
+*  `num_planets`
+*  `symmetry`: "point" if the map is symmetric about the midpoint between the
+   home planets, "line" if it is symmetric about their perpendicular bisector
+   and "none" otherwise
+*  `home_distance`: the number of turns between the home planets
+*  `neutral_ships`: the total number of ships on neutral planets
+*  `total_growth` and `neutral_growth`: the sums of the planets' growth rates
+
+The number of turns between every pair of planets is given by
+`StoredMap.distances`, which is computed from the map when it is first needed.
+
+Maps are deduplicated: a map is not added if it is a stored map with the planets
+reordered, moved, rotated or mirrored, or with the players swapped. Maps can be
+sampled with filters on their features, such as
+
+    store = MapStore("maps.pwm")
+    store.sample(10, seed=0, min_num_planets=20, symmetry="point")
+
+which saves writing a map file for every game and allows evaluations to be
+stratified by the kind of map.
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+from dataclasses import dataclass
+
+import tools.engine
+import tools.map_generator_v2
+
+# planets that are this close (after transforming a map) are considered to be in
+# the same place
+TOLERANCE = 1e-3
+# version of the format of store files; stores of earlier versions are converted
+# when they are loaded
+STORE_VERSION = 2
+
+
+@dataclass
+class StoredMap:
+    name: str
+    map_data: str
+    hash: str
+    features: dict
+
+    def distances(self) -> list:
+        """Return the number of turns between every pair of planets."""
+        if not hasattr(self, "_distances"):
+            planets = tools.engine.parse_map(self.map_data)
+            self._distances = [[tools.engine.distance(p, q) for q in planets] for p in planets]
+        return self._distances
+
+
+def _home_planets(planets: list):
+    homes = {p.owner: p for p in planets if p.owner != tools.engine.NEUTRAL}
+    if len(homes) != 2 or sum(p.owner != tools.engine.NEUTRAL for p in planets) != 2:
+        return None
+    return homes[tools.engine.PLAYER_ONE], homes[tools.engine.PLAYER_TWO]
+
+
+def _swapped_owner(owner: int) -> int:
+    return tools.engine.pov_owner(owner, tools.engine.PLAYER_TWO)
+
+
+def _is_symmetric(planets: list, transform) -> bool:
+    # whether `transform` maps every planet onto one with the same ships and growth
+    # rate, and with the players swapped
+    for p in planets:
+        x, y = transform(p.x, p.y)
+        if not any(abs(q.x - x) < TOLERANCE and abs(q.y - y) < TOLERANCE
+                   and q.owner == _swapped_owner(p.owner) and q.num_ships == p.num_ships
+                   and q.growth_rate == p.growth_rate for q in planets):
+            return False
+    return True
+
+
+def _symmetry(planets: list) -> str:
+    homes = _home_planets(planets)
+    if homes is None:
+        return "none"
+    home_one, home_two = homes
+    cx, cy = (home_one.x + home_two.x) / 2, (home_one.y + home_two.y) / 2
+    if _is_symmetric(planets, lambda x, y: (2 * cx - x, 2 * cy - y)):
+        return "point"
+    length = math.hypot(home_two.x - home_one.x, home_two.y - home_one.y)
+    if length == 0:
+        return "none"
+    ux, uy = (home_two.x - home_one.x) / length, (home_two.y - home_one.y) / length
+
+    def reflect(x, y):
+        along = (x - cx) * ux + (y - cy) * uy
+        return x - 2 * along * ux, y - 2 * along * uy
+
+    return "line" if _is_symmetric(planets, reflect) else "none"
+
+
+def map_features(map_data: str) -> dict:
+    planets = tools.engine.parse_map(map_data)
+    homes = _home_planets(planets)
+    neutrals = [p for p in planets if p.owner == tools.engine.NEUTRAL]
+    return {
+        "num_planets": len(planets),
+        "symmetry": _symmetry(planets),
+        "home_distance": tools.engine.distance(*homes) if homes else 0,
+        "neutral_ships": sum(p.num_ships for p in neutrals),
+        "total_growth": sum(p.growth_rate for p in planets),
+        "neutral_growth": sum(p.growth_rate for p in neutrals),
+    }
+
+
+def canonical_hash(map_data: str) -> str:
+    """Return a hash of the map that is the same for all its symmetric equivalents.
+
+    Only the ships and growth rates of the planets, and whether they are neutral,
+    are hashed, as rounding coordinates would put some equivalents on either side
+    of a rounding boundary. Maps with the same hash are compared with `equivalent`.
+    """
+    planets = tools.engine.parse_map(map_data)
+    contents = sorted((p.owner == tools.engine.NEUTRAL, p.num_ships, p.growth_rate)
+                      for p in planets)
+    return hashlib.sha1(repr(contents).encode()).hexdigest()
+
+
+def _canonical_forms(planets: list) -> list:
+    # The map centered on the midpoint between the home planets and rotated so
+    # that one of them is on the positive x axis, as (x, y, owner, ships, growth
+    # rate) tuples sorted by x; starting from either home planet (swapping the
+    # players) and mirroring the map or not gives four forms, the first of which
+    # is the map itself.
+    homes = _home_planets(planets)
+    forms = []
+    for swap in (False, True):
+        if homes:
+            first = homes[1] if swap else homes[0]
+            cx = (homes[0].x + homes[1].x) / 2
+            cy = (homes[0].y + homes[1].y) / 2
+            angle = math.atan2(first.y - cy, first.x - cx)
+        else:
+            cx = sum(p.x for p in planets) / max(1, len(planets))
+            cy = sum(p.y for p in planets) / max(1, len(planets))
+            angle = 0.0
+        cos, sin = math.cos(-angle), math.sin(-angle)
+        for mirror in (1, -1):
+            form = []
+            for p in planets:
+                x, y = p.x - cx, p.y - cy
+                form.append((x * cos - y * sin, mirror * (x * sin + y * cos),
+                             _swapped_owner(p.owner) if swap else p.owner,
+                             p.num_ships, p.growth_rate))
+            forms.append(sorted(form))
+    return forms
+
+
+def _same_form(form: list, other: list) -> bool:
+    # whether every planet of `form` is within TOLERANCE of a distinct planet of
+    # `other` with the same owner, ships and growth rate
+    if len(form) != len(other):
+        return False
+    unmatched = list(other)
+    for x, y, owner, num_ships, growth_rate in form:
+        for i, (other_x, other_y, other_owner, other_ships, other_growth) in enumerate(unmatched):
+            if (abs(other_x - x) < TOLERANCE and abs(other_y - y) < TOLERANCE
+                    and (other_owner, other_ships, other_growth)
+                    == (owner, num_ships, growth_rate)):
+                del unmatched[i]
+                break
+        else:
+            return False
+    return True
+
+
+def equivalent(map_data: str, other_map_data: str) -> bool:
+    """Return whether the maps are the same up to moving, rotating, mirroring and swapping."""
+    other_form = _canonical_forms(tools.engine.parse_map(other_map_data))[0]
+    return any(_same_form(form, other_form)
+               for form in _canonical_forms(tools.engine.parse_map(map_data)))
+
+
+def _matches(features: dict, filters: dict) -> bool:
+    for key, value in filters.items():
+        if key.startswith("min_"):
+            if features[key[4:]] < value:
+                return False
+        elif key.startswith("max_"):
+            if features[key[4:]] > value:
+                return False
+        elif features[key] != value:
+            return False
+    return True
+
+
+class MapStore:
+    """Maps kept in one gzipped JSON file, which is created by `save` if needed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.maps = []
+        self._by_hash = {}
+        self._by_name = {}
+        if os.path.exists(path):
+            with gzip.open(path, "rt") as store_file:
+                contents = json.load(store_file)
+            for entry in contents["maps"]:
+                if contents.get("version", 1) < STORE_VERSION:
+                    # version 1 stored the distances and hashed rounded coordinates
+                    entry["features"].pop("distances", None)
+                    entry["hash"] = canonical_hash(entry["map_data"])
+                self._index(StoredMap(**entry))
+
+    def _index(self, stored_map: StoredMap):
+        self.maps.append(stored_map)
+        self._by_hash.setdefault(stored_map.hash, []).append(stored_map)
+        self._by_name[stored_map.name] = stored_map
+
+    def __len__(self) -> int:
+        return len(self.maps)
+
+    def __getitem__(self, name: str) -> StoredMap:
+        return self._by_name[name]
+
+    def add(self, name: str, map_data: str) -> bool:
+        """Add a map, unless it is an equivalent of a stored map; return whether it was added."""
+        map_hash = canonical_hash(map_data)
+        if name in self._by_name or any(equivalent(map_data, stored_map.map_data)
+                                        for stored_map in self._by_hash.get(map_hash, ())):
+            return False
+        self._index(StoredMap(name, map_data, map_hash, map_features(map_data)))
+        return True
+
+    def save(self):
+        with gzip.open(self.path, "wt") as store_file:
+            json.dump({"version": STORE_VERSION,
+                       "maps": [{"name": m.name, "map_data": m.map_data, "hash": m.hash,
+                                 "features": m.features} for m in self.maps]},
+                      store_file, separators=(",", ":"))
+
+    def select(self, **filters) -> list:
+        """Return the maps whose features match all the filters.
+
+        A filter `min_<feature>` or `max_<feature>` bounds a feature, and any other
+        filter `<feature>` gives its exact value.
+        """
+        return [m for m in self.maps if _matches(m.features, filters)]
+
+    def sample(self, count: int = 1, seed=None, replace: bool = False, **filters) -> list:
+        """Return `count` maps chosen at random among those matching the filters.
+
+        The maps are all different unless `replace` is true, in which case a map
+        can be chosen several times.
+        """
+        matching = self.select(**filters)
+        rng = random.Random(seed)
+        if replace:
+            if not matching:
+                raise ValueError("no map in the store matches the filters.")
+            return rng.choices(matching, k=count)
+        if count > len(matching):
+            raise ValueError(f"only {len(matching)} maps in the store match the filters, "
+                             f"fewer than the {count} requested.")
+        return rng.sample(matching, count)
+
+
+def parse_filters(filters: list) -> dict:
+    """Parse "<filter>=<value>" strings as given on the command line."""
+    parsed = {}
+    for item in filters or ():
+        key, _, value = item.partition("=")
+        try:
+            parsed[key] = int(value)
+        except ValueError:
+            parsed[key] = value
+    return parsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query a store of maps.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser(
+        "add", help="add map files and generated maps to a store, skipping duplicates.")
+    add_parser.add_argument("store", action="store", type=str, help="file of the store.")
+    add_parser.add_argument("maps", action="store", type=str, nargs="*",
+                            help="map files (or glob patterns) to add.")
+    add_parser.add_argument("--generated", action="store", default=0, type=int,
+                            help="number of maps to generate and add.", dest="generated")
+    add_parser.add_argument("--seed", action="store", default=0, type=int,
+                            help="seed of the first generated map.", dest="seed")
+
+    sample_parser = subparsers.add_parser(
+        "sample", help="print the names of maps chosen at random from a store.")
+    sample_parser.add_argument("store", action="store", type=str, help="file of the store.")
+    sample_parser.add_argument("--count", action="store", default=1, type=int,
+                               help="number of maps to choose.", dest="count")
+    sample_parser.add_argument("--seed", action="store", default=None, type=int,
+                               help="seed of the choice.", dest="seed")
+    sample_parser.add_argument(
+        "--filter", action="append", default=None, type=str,
+        help="\"<feature>=<value>\", \"min_<feature>=<value>\" or \"max_<feature>=<value>\" "
+             "that the maps must match; can be given several times.", dest="filters")
+    sample_parser.add_argument("--replace", action="store_true", dest="replace",
+                               help="allow a map to be chosen several times.")
+    sample_parser.add_argument("--output_dir", action="store", default="", type=str,
+                               help="directory to also write the chosen maps to.",
+                               dest="output_dir")
+    arguments = parser.parse_args()
+
+    store = MapStore(arguments.store)
+    if arguments.command == "add":
+        added = 0
+        for pattern in arguments.maps:
+            for path in sorted(glob.glob(pattern)):
+                with open(path) as map_file:
+                    added += store.add(os.path.basename(path), map_file.read())
+        for map_seed in range(arguments.seed, arguments.seed + arguments.generated):
+            added += store.add(f"seed{map_seed}", tools.map_generator_v2.generate_map(map_seed))
+        store.save()
+        print(f"Added {added} maps, {len(store)} in the store.")
+    else:
+        try:
+            chosen = store.sample(arguments.count, arguments.seed, arguments.replace,
+                                  **parse_filters(arguments.filters))
+        except ValueError as error:
+            sample_parser.error(str(error))
+        for stored_map in chosen:
+            print(stored_map.name)
+            if arguments.output_dir:
+                with open(os.path.join(arguments.output_dir, stored_map.name), "w") as map_file:
+                    map_file.write(stored_map.map_data)
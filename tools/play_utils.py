@@ -1,5 +1,11 @@
+import json
+import multiprocessing
+import multiprocessing.util
+import os
 import platform
-import subprocess
+import shutil
+
+import tools.engine
 
 PYTHON = "python" if platform.system() == "Windows" else "python3"
 COMMANDS_LOOKUP = {
@@ -9,10 +15,68 @@ COMMANDS_LOOKUP = {
     frozenset(("py", "pyc", "pyo")): PYTHON + " {}",
 }
 
+# file caching the path of every interpreter found for each value of PATH
+COMMAND_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "planet-wars",
+    "commands.json")
+
+# the pair of CPUs that the bots of games played by this pool worker are pinned to
+worker_cpus = None
+# event set by the parent of this pool worker once the games it has not started are unwanted
+_cancelled = None
+# the bots kept alive between the games played by this process
+_bot_pool = None
+
+
+# interpreter paths found by this process, which are only valid for the PATH
+# they were found with
+_interpreters = {}
+_interpreters_path = None
+
+
+def _load_command_cache() -> dict:
+    try:
+        with open(COMMAND_CACHE) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
 
-def _command_exists(c: str) -> bool:
-    status, response = subprocess.getstatusoutput(f"{c} --version")
-    return status == 0
+def _save_command_cache(cache: dict):
+    # the cache only saves time, so failing to write it is not an error
+    try:
+        os.makedirs(os.path.dirname(COMMAND_CACHE), exist_ok=True)
+        temporary = f"{COMMAND_CACHE}.{os.getpid()}"
+        with open(temporary, "w") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temporary, COMMAND_CACHE)
+    except OSError:
+        pass
+
+
+def find_interpreter(c: str):
+    """Return the path of the executable `c` as `shutil.which` finds it, or None.
+
+    Paths are cached in memory and on disk for the current PATH; cached paths that
+    are no longer executable are looked up again.
+    """
+    global _interpreters, _interpreters_path
+
+    search_path = os.environ.get("PATH", os.defpath)
+    if search_path != _interpreters_path:
+        _interpreters = _load_command_cache().get(search_path, {})
+        _interpreters_path = search_path
+    path = _interpreters.get(c)
+    if path and os.path.isfile(path) and os.access(path, os.X_OK):
+        return path
+
+    path = shutil.which(c)
+    if path and _interpreters.get(c) != path:
+        _interpreters[c] = path
+        cache = _load_command_cache()
+        cache.setdefault(search_path, {})[c] = path
+        _save_command_cache(cache)
+    return path
 
 
 def get_command(f: str) -> str:
@@ -20,8 +84,62 @@ def get_command(f: str) -> str:
     for extensions, command in COMMANDS_LOOKUP.items():
         if ext in extensions:
             base_command = command.split()[0]
-            if not _command_exists(base_command):
+            if find_interpreter(base_command) is None:
                 raise RuntimeError(f"You don't have `{base_command}` installed.")
             return command.format(f)
     else:
         return f"./{f}"
+
+
+def resolve_all(bots) -> dict:
+    """Return the command of every bot file, looking each interpreter up only once."""
+    return {bot: get_command(bot) for bot in dict.fromkeys(bots)}
+
+
+def available_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_worker(next_slot, jobs, cancelled):
+    global worker_cpus, _cancelled
+
+    _cancelled = cancelled
+    # the pool runs this again for a worker that replaces one that died, which must
+    # not wait for a slot; such workers play their games unpinned
+    with next_slot.get_lock():
+        slot = next_slot.value
+        next_slot.value += 1
+    if slot >= jobs:
+        worker_cpus = None
+        return
+    cpus = available_cpus()
+    worker_cpus = ({cpus[2 * slot % len(cpus)]}, {cpus[(2 * slot + 1) % len(cpus)]})
+
+
+def create_pool(jobs: int, cancelled=None) -> multiprocessing.Pool:
+    """Create a pool of `jobs` workers whose games pin each bot to its own CPU.
+
+    With at most half as many workers as CPUs, no two bots ever share a CPU. Once
+    the `cancelled` event (a `multiprocessing.Event`) is set, `games_cancelled`
+    is true in the workers, so that they can skip the games left in the pool.
+    """
+    return multiprocessing.Pool(jobs, _init_worker, (multiprocessing.Value("i", 0), jobs,
+                                                     cancelled))
+
+
+def games_cancelled() -> bool:
+    """Return whether the games not yet started by this pool worker are no longer wanted."""
+    return _cancelled is not None and _cancelled.is_set()
+
+
+def worker_bot_pool() -> tools.engine.BotPool:
+    """Return the pool of bots kept alive between the games played by this process."""
+    global _bot_pool
+
+    if _bot_pool is None:
+        _bot_pool = tools.engine.BotPool()
+        # pool workers exit without running `atexit` handlers, but run finalizers
+        multiprocessing.util.Finalize(_bot_pool, _bot_pool.close, exitpriority=10)
+    return _bot_pool
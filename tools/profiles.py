@@ -0,0 +1,158 @@
+"""Aggregate the per-turn profiles written by the Python starter bot.
+
+The bot writes the profiles when `PLANETWARS_PROFILE` is set (see
+`starterbots/python_starterbot/Profiling.py`). They are turned into the folded
+stack format ("frame;frame;frame count" lines, with counts in microseconds)
+read by flamegraph.pl, inferno and speedscope:
+
+    python3 -m tools.profiles profile.bin --turns 1-10 > turns.folded
+    flamegraph.pl turns.folded > turns.svg
+
+Every bot process writes its own records, which name its process ID and the
+player it played as, so the profiles of both players of a game, or of bots
+writing to one file per process (see `%p`), can be told apart or merged.
+
+cProfile only records which function called which, not whole stacks, so the
+time of a function is split among the stacks it appears in in proportion to
+the time spent in it from each of its callers.
+"""
+
+import argparse
+import marshal
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "starterbots", "python_starterbot"))
+from Profiling import ParseTurns
+
+# stacks with less time than this (in seconds) are left out
+MIN_TIME = 1e-7
+
+
+def read_profiles(path: str):
+    """Yield the (pid, player, game, turn, stats) records of a profile file.
+
+    `stats` is in pstats' format and `player` is 0 for bots not told their player.
+    """
+    with open(path, "rb") as profile_file:
+        while True:
+            try:
+                yield marshal.load(profile_file)
+            except EOFError:
+                return
+
+
+def merge_stats(all_stats) -> dict:
+    merged = {}
+    for stats in all_stats:
+        for function, (cc, nc, tt, ct, callers) in stats.items():
+            if function not in merged:
+                merged[function] = [0, 0, 0.0, 0.0, defaultdict(lambda: [0, 0, 0.0, 0.0])]
+            total = merged[function]
+            total[0] += cc
+            total[1] += nc
+            total[2] += tt
+            total[3] += ct
+            for caller, edge in callers.items():
+                total_edge = total[4][caller]
+                for i, value in enumerate(edge):
+                    total_edge[i] += value
+    return {function: (cc, nc, tt, ct, dict(callers))
+            for function, (cc, nc, tt, ct, callers) in merged.items()}
+
+
+def _label(function: tuple) -> str:
+    filename, _, name = function
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{name}"
+
+
+def _is_profiler(function: tuple) -> bool:
+    # the calls that stop the profiler are recorded too
+    return os.path.basename(function[0]) == "Profiling.py" or "_lsprof.Profiler" in function[2]
+
+
+def root_times(stats: dict) -> dict:
+    """Return the time of every function that was called directly by the profiled turn loop."""
+    roots = {}
+    for function, (_, _, _, ct, callers) in stats.items():
+        time = ct - sum(edge[3] for edge in callers.values())
+        if time > MIN_TIME and not _is_profiler(function):
+            roots[function] = time
+    return roots
+
+
+def folded_stacks(stats: dict, prefix: str = "") -> dict:
+    """Return the time (in seconds) spent in every stack, keyed by its folded form."""
+    children = defaultdict(list)
+    for callee, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            children[caller].append((callee, edge[3]))
+
+    stacks = defaultdict(float)
+
+    def visit(function, time, path, on_path):
+        _, _, tt, ct, _ = stats[function]
+        path = f"{path};{_label(function)}" if path else _label(function)
+        # the share of the function's time that is spent on this path
+        share = time / ct if ct else 0.0
+        if tt * share > MIN_TIME:
+            stacks[path] += tt * share
+        for child, edge_time in children[function]:
+            if child not in on_path and edge_time * share > MIN_TIME:
+                visit(child, edge_time * share, path, on_path | {child})
+
+    for function, time in root_times(stats).items():
+        visit(function, time, prefix, {function})
+    return stacks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Aggregate the profiles of the Python starter bot into folded stacks.")
+    parser.add_argument("profiles", action="store", type=str, nargs="+",
+                        help="files the bots wrote their profiles to.")
+    parser.add_argument("--turns", action="store", default="", type=str,
+                        help="turns to aggregate, such as \"1-5,100\" (default: all).",
+                        dest="turns")
+    parser.add_argument("--game", action="store", default=None, type=int,
+                        help="game of a session to aggregate (default: all).", dest="game")
+    parser.add_argument("--player", action="store", default=None, type=int,
+                        help="player whose profiles to aggregate (default: all).", dest="player")
+    parser.add_argument("--pid", action="store", default=None, type=int,
+                        help="process whose profiles to aggregate (default: all).", dest="pid")
+    parser.add_argument("--per_turn", action="store_true", dest="per_turn",
+                        help="start every stack with its turn, to show turns separately.")
+    parser.add_argument("--slowest", action="store", default=0, type=int,
+                        help="print the total time of this many of the slowest turns instead "
+                             "of stacks.", dest="slowest")
+    arguments = parser.parse_args()
+
+    turns = ParseTurns(arguments.turns)
+    records = [(pid, player, game, turn, stats)
+               for path in arguments.profiles
+               for pid, player, game, turn, stats in read_profiles(path)
+               if (turns is None or turn in turns)
+               and (arguments.game is None or game == arguments.game)
+               and (arguments.player is None or player == arguments.player)
+               and (arguments.pid is None or pid == arguments.pid)]
+
+    if arguments.slowest:
+        totals = [(sum(root_times(stats).values()), pid, player, game, turn)
+                  for pid, player, game, turn, stats in records]
+        for total, pid, player, game, turn in sorted(totals, reverse=True)[:arguments.slowest]:
+            print(f"pid {pid} player {player} game {game} turn {turn}: {1000 * total:.3f} ms")
+    elif arguments.per_turn:
+        for pid, player, game, turn, stats in records:
+            prefix = f"pid {pid} player {player} game {game} turn {turn}"
+            for stack, time in folded_stacks(stats, prefix).items():
+                if round(time * 1e6):
+                    print(f"{stack} {round(time * 1e6)}")
+    else:
+        stacks = folded_stacks(merge_stats(stats for *_, stats in records))
+        for stack, time in sorted(stacks.items()):
+            if round(time * 1e6):
+                print(f"{stack} {round(time * 1e6)}")
@@ -0,0 +1,39 @@
+"""Elo ratings of many bots from the results of games between them."""
+
+import math
+
+# number of iterations of the Bradley-Terry minorization-maximization algorithm
+ITERATIONS = 200
+
+
+def elo_ratings(bots: list, results: list) -> dict:
+    """Return the Elo rating of every bot, centered on 0.
+
+    `results` holds (bot_one, bot_two, score) tuples where the score of the first
+    bot is 1 for a win, 0.5 for a draw and 0 for a loss. Ratings are the maximum
+    likelihood estimates of the Bradley-Terry model, with draws counting as half
+    a win, and every bot is given one virtual draw against an average opponent so
+    that bots that won or lost every game still get a finite rating.
+    """
+    scores = {bot: 0.5 for bot in bots}
+    opponents = {bot: {} for bot in bots}
+    for bot_one, bot_two, score in results:
+        scores[bot_one] += score
+        scores[bot_two] += 1 - score
+        opponents[bot_one][bot_two] = opponents[bot_one].get(bot_two, 0) + 1
+        opponents[bot_two][bot_one] = opponents[bot_two].get(bot_one, 0) + 1
+
+    strengths = {bot: 1.0 for bot in bots}
+    for _ in range(ITERATIONS):
+        updated = {}
+        for bot in bots:
+            # the virtual draw is against an opponent of strength 1
+            denominator = 1 / (strengths[bot] + 1)
+            for opponent, games in opponents[bot].items():
+                denominator += games / (strengths[bot] + strengths[opponent])
+            updated[bot] = scores[bot] / denominator
+        strengths = updated
+
+    elos = {bot: 400 * math.log10(strength) for bot, strength in strengths.items()}
+    mean = sum(elos.values()) / len(elos) if elos else 0.0
+    return {bot: elo - mean for bot, elo in elos.items()}
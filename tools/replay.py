@@ -0,0 +1,179 @@
+"""Compact binary replay format for Planet Wars games.
+
+A replay starts with the static planet table and is followed by one record per
+turn holding only the planets whose owner or ship count changed and the fleets
+launched that turn; fleets in flight are reconstructed from their launches. The
+game result is stored in a final record. All integers are unsigned LEB128
+varints and replays whose file names end with ".gz" are gzip compressed.
+
+Replays are written incrementally during a game with `ReplayWriter`, read back
+turn by turn with `ReplayReader` and converted to the playback string read by
+`visualizer/visualize_locally.py` with `to_playback`.
+"""
+
+import argparse
+import gzip
+import struct
+import sys
+
+MAGIC = b"PWR1"
+
+TURN_RECORD = 1
+RESULT_RECORD = 2
+
+_COORDINATES = struct.Struct("<dd")
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _write_varints(buffer: bytearray, *values):
+    for value in values:
+        while value >= 0x80:
+            buffer.append((value & 0x7f) | 0x80)
+            value >>= 7
+        buffer.append(value)
+
+
+class _VarintStream:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def at_end(self) -> bool:
+        return self.position >= len(self.data)
+
+    def read(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self.data[self.position]
+            self.position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_many(self, count: int) -> tuple:
+        return tuple(self.read() for _ in range(count))
+
+    def read_coordinates(self) -> tuple:
+        coordinates = _COORDINATES.unpack_from(self.data, self.position)
+        self.position += _COORDINATES.size
+        return coordinates
+
+
+class ReplayWriter:
+    def __init__(self, path: str, planets: list):
+        """Start a replay of a game on `planets` (`tools.engine.Planet`s)."""
+        self._file = _open(path, "wb")
+        self._state = [(p.owner, p.num_ships) for p in planets]
+
+        header = bytearray(MAGIC)
+        _write_varints(header, len(planets))
+        for p in planets:
+            header += _COORDINATES.pack(p.x, p.y)
+            _write_varints(header, p.owner, p.num_ships, p.growth_rate)
+        self._file.write(header)
+
+    def write_turn(self, planets: list, launches: list):
+        """Record a turn given the planets after it and the fleets launched during it."""
+        changes = []
+        for planet_id, p in enumerate(planets):
+            state = (p.owner, p.num_ships)
+            if state != self._state[planet_id]:
+                self._state[planet_id] = state
+                changes.append((planet_id, p.owner, p.num_ships))
+
+        record = bytearray((TURN_RECORD,))
+        _write_varints(record, len(changes))
+        for change in changes:
+            _write_varints(record, *change)
+        _write_varints(record, len(launches))
+        for f in launches:
+            _write_varints(record, f.owner, f.num_ships, f.source, f.destination,
+                           f.total_trip_length)
+        self._file.write(record)
+
+    def write_result(self, winner: int, turns: int):
+        record = bytearray((RESULT_RECORD,))
+        _write_varints(record, winner, turns)
+        self._file.write(record)
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayReader:
+    """Iterating over a replay yields, for each turn, the list of (owner, num_ships)
+    of every planet and the list of (owner, num_ships, source, destination,
+    total_trip_length, turns_remaining) of every fleet in flight.
+    """
+
+    def __init__(self, path: str):
+        with _open(path, "rb") as replay_file:
+            data = replay_file.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"\"{path}\" is not a replay file.")
+        self._stream = _VarintStream(data)
+        self._stream.position = len(MAGIC)
+
+        # (x, y, owner, num_ships, growth_rate) of every planet at the start
+        self.planets = []
+        for _ in range(self._stream.read()):
+            x, y = self._stream.read_coordinates()
+            self.planets.append((x, y) + self._stream.read_many(3))
+        self._turns_start = self._stream.position
+
+        # the result is only known once all the turns have been read
+        self.winner = None
+        self.turns = None
+
+    def __iter__(self):
+        stream = self._stream
+        stream.position = self._turns_start
+        planets = [(p[2], p[3]) for p in self.planets]
+        fleets = []
+        while not stream.at_end():
+            record_type = stream.read()
+            if record_type == RESULT_RECORD:
+                self.winner, self.turns = stream.read_many(2)
+                continue
+            if record_type != TURN_RECORD:
+                raise ValueError(f"Unknown replay record type {record_type}.")
+
+            for _ in range(stream.read()):
+                planet_id, owner, num_ships = stream.read_many(3)
+                planets[planet_id] = (owner, num_ships)
+            for _ in range(stream.read()):
+                owner, num_ships, source, destination, trip_length = stream.read_many(5)
+                fleets.append((owner, num_ships, source, destination, trip_length, trip_length))
+            fleets = [f[:5] + (f[5] - 1,) for f in fleets if f[5] > 1]
+            yield list(planets), fleets
+
+
+def to_playback(path: str) -> str:
+    """Convert a replay to the playback string read by `visualizer/visualize_locally.py`."""
+    reader = ReplayReader(path)
+    playback_planets = ":".join(
+        f"{x!r},{y!r},{owner},{num_ships},{growth_rate}"
+        for x, y, owner, num_ships, growth_rate in reader.planets)
+    playback_turns = []
+    for planets, fleets in reader:
+        frame = [f"{owner}.{num_ships}" for owner, num_ships in planets]
+        frame.extend(".".join(map(str, f)) for f in fleets)
+        playback_turns.append(",".join(frame))
+    return playback_planets + "|" + ":".join(playback_turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Print the visualizer playback string of a replay, e.g. to pipe into "
+                    "`visualizer/visualize_locally.py`.")
+    parser.add_argument("replay", action="store", type=str, help="replay file to convert.")
+    arguments = parser.parse_args()
+
+    sys.stdout.write(to_playback(arguments.replay) + "\n")
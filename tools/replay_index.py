@@ -0,0 +1,269 @@
+"""Columnar, memory-mapped index of replay archives.
+
+Replays written by `tools/replay.py` are scanned once into per-game and per-turn
+summary columns, each stored as a raw binary file next to an `index.json`
+describing them. Queries memory-map only the columns they use and never touch
+the original replays, so even indexes of millions of games can be queried on a
+laptop. For example, all losses of player 1 on maps with more than 25 planets
+where player 1 had more ships after turn 100:
+
+    index = ReplayIndex("index")
+    ahead = index.at_turn("ships_1", 100) > index.at_turn("ships_2", 100)
+    lost = (index.games["winner"] == 2) & (index.games["num_planets"] > 25)
+    paths = index.paths(np.nonzero(lost & ahead)[0])
+
+Requires NumPy.
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import tools.replay
+
+GAME_COLUMNS = {
+    "winner": "i1",
+    "turns": "i2",
+    "num_planets": "i2",
+    # row of the game's turn 0 in the per-turn columns
+    "turn_start": "i8",
+}
+
+# per-turn columns, with one row for the initial state (turn 0) and one for the
+# state after each turn
+TURN_COLUMNS = {
+    "game": "i4",
+    "turn": "i2",
+    "ships_1": "i4",
+    "ships_2": "i4",
+    "planets_1": "i2",
+    "planets_2": "i2",
+    "production_1": "i4",
+    "production_2": "i4",
+}
+
+INDEX_FILENAME = "index.json"
+PATHS_FILENAME = "paths.txt"
+REPLAY_EXTENSION = ".pwr"
+# number of replays handed to the process pool at once, so that the paths
+# are never all held in memory
+BATCH_SIZE = 10000
+# number of turn rows gathered before the columns are written
+FLUSH_ROWS = 1 << 18
+
+
+def _column_path(index_dir: str, table: str, column: str) -> str:
+    return os.path.join(index_dir, f"{table}.{column}.bin")
+
+
+def summarize_replay(path: str) -> tuple:
+    """Return the per-game values and the per-turn rows (without the game column) of a replay."""
+    reader = tools.replay.ReplayReader(path)
+    growth_rates = [p[4] for p in reader.planets]
+    initial_planets = [(p[2], p[3]) for p in reader.planets]
+    initial_state = (initial_planets, [])
+
+    rows = []
+    for turn, (planets, fleets) in enumerate(_with_first(initial_state, reader)):
+        ships = [0, 0, 0]
+        planet_counts = [0, 0, 0]
+        production = [0, 0, 0]
+        for (owner, num_ships), growth_rate in zip(planets, growth_rates):
+            ships[owner] += num_ships
+            planet_counts[owner] += 1
+            production[owner] += growth_rate
+        for f in fleets:
+            ships[f[0]] += f[1]
+        rows.append((turn, ships[1], ships[2], planet_counts[1], planet_counts[2],
+                     production[1], production[2]))
+
+    winner = -1 if reader.winner is None else reader.winner
+    return (winner, len(rows) - 1, len(reader.planets)), rows
+
+
+def _with_first(first, iterable):
+    yield first
+    yield from iterable
+
+
+def iter_replay_paths(sources, paths_file=None):
+    """Yield the replay paths given by `sources` and then those listed in `paths_file`.
+
+    Each source is a replay file, a directory (whose replays are found
+    recursively) or a glob pattern. `paths_file` lists one path per line.
+    """
+    for source in sources:
+        if os.path.isdir(source):
+            for directory, subdirectories, filenames in os.walk(source):
+                subdirectories.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith(REPLAY_EXTENSION):
+                        yield os.path.join(directory, filename)
+        elif glob.has_magic(source):
+            yield from glob.iglob(source, recursive=True)
+        else:
+            yield source
+    if paths_file:
+        for line in paths_file:
+            if line.strip():
+                yield line.strip()
+
+
+def _write_columns(rows: list, columns: dict, files: dict):
+    values = np.array(rows, dtype=np.int64)
+    for i, (column, dtype) in enumerate(columns.items()):
+        values[:, i].astype(dtype).tofile(files[column])
+    rows.clear()
+
+
+def build_index(replay_paths, index_dir: str, processes=None):
+    """Scan the replays (on a process pool) and write their index to `index_dir`.
+
+    `replay_paths` can be any iterable, such as `iter_replay_paths`; it is read in
+    batches, and the columns are written in chunks, so that indexes of millions of
+    replays can be built without holding them in memory.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    game_files = {c: open(_column_path(index_dir, "games", c), "wb") for c in GAME_COLUMNS}
+    turn_files = {c: open(_column_path(index_dir, "turns", c), "wb") for c in TURN_COLUMNS}
+    paths_file = open(os.path.join(index_dir, PATHS_FILENAME), "w")
+    num_games = 0
+    num_turn_rows = 0
+    game_rows = []
+    turn_rows = []
+
+    replay_paths = iter(replay_paths)
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            batch = list(itertools.islice(replay_paths, BATCH_SIZE))
+            if not batch:
+                break
+            summaries = pool.imap(summarize_replay, batch, chunksize=64)
+            for path, (game_values, rows) in zip(batch, summaries):
+                game_rows.append(game_values + (num_turn_rows,))
+                turn_rows.extend((num_games,) + row for row in rows)
+                paths_file.write(os.path.abspath(path) + "\n")
+                num_games += 1
+                num_turn_rows += len(rows)
+                if len(turn_rows) >= FLUSH_ROWS:
+                    _write_columns(game_rows, GAME_COLUMNS, game_files)
+                    _write_columns(turn_rows, TURN_COLUMNS, turn_files)
+    if game_rows:
+        _write_columns(game_rows, GAME_COLUMNS, game_files)
+        _write_columns(turn_rows, TURN_COLUMNS, turn_files)
+
+    for column_file in list(game_files.values()) + list(turn_files.values()) + [paths_file]:
+        column_file.close()
+    with open(os.path.join(index_dir, INDEX_FILENAME), "w") as index_file:
+        json.dump({"games": num_games, "turn_rows": num_turn_rows,
+                   "game_columns": GAME_COLUMNS, "turn_columns": TURN_COLUMNS}, index_file)
+
+
+class ReplayIndex:
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, INDEX_FILENAME)) as index_file:
+            metadata = json.load(index_file)
+        self.num_games = metadata["games"]
+        self.games = {
+            column: self._map("games", column, dtype, self.num_games)
+            for column, dtype in metadata["game_columns"].items()
+        }
+        self.turns = {
+            column: self._map("turns", column, dtype, metadata["turn_rows"])
+            for column, dtype in metadata["turn_columns"].items()
+        }
+        self._paths = None
+
+    def _map(self, table: str, column: str, dtype: str, length: int) -> np.ndarray:
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(_column_path(self.index_dir, table, column), dtype=dtype, mode="r",
+                         shape=(length,))
+
+    def at_turn(self, column: str, turn: int, missing=-1) -> np.ndarray:
+        """Return the value of a per-turn column for every game after `turn` turns.
+
+        Games that ended before `turn` get `missing`.
+        """
+        values = np.full(self.num_games, missing, dtype=np.int64)
+        lasted = self.games["turns"] >= turn
+        rows = self.games["turn_start"][lasted] + turn
+        values[lasted] = self.turns[column][rows]
+        return values
+
+    def paths(self, game_ids) -> list:
+        if self._paths is None:
+            with open(os.path.join(self.index_dir, PATHS_FILENAME)) as paths_file:
+                self._paths = paths_file.read().splitlines()
+        return [self._paths[game_id] for game_id in game_ids]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index replays and query the index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="build an index of replay files.")
+    build_parser.add_argument("index_dir", action="store", type=str,
+                              help="directory to write the index to.")
+    build_parser.add_argument("replays", action="store", type=str, nargs="*",
+                              help="replay files, directories of replays or quoted glob "
+                                   "patterns such as \"replays/**/*.pwr\" to index.")
+    build_parser.add_argument("--paths_file", action="store", default="", type=str,
+                              help="file listing replays to index, one per line "
+                                   "(\"-\" for standard input).", dest="paths_file")
+
+    query_parser = subparsers.add_parser(
+        "query", help="print the replays in an index matching all the given filters.")
+    query_parser.add_argument("index_dir", action="store", type=str,
+                              help="directory of the index.")
+    query_parser.add_argument("--winner", action="store", default=None, type=int,
+                              help="winner of the game (0 for a draw).", dest="winner")
+    query_parser.add_argument("--min_planets", action="store", default=None, type=int,
+                              help="minimum number of planets on the map.", dest="min_planets")
+    query_parser.add_argument("--max_planets", action="store", default=None, type=int,
+                              help="maximum number of planets on the map.", dest="max_planets")
+    query_parser.add_argument("--ahead_at", action="store", default=None, type=int,
+                              help="turn after which player 1 has more ships than player 2.",
+                              dest="ahead_at")
+    query_parser.add_argument("--behind_at", action="store", default=None, type=int,
+                              help="turn after which player 1 has fewer ships than player 2.",
+                              dest="behind_at")
+    arguments = parser.parse_args()
+
+    if arguments.command == "build":
+        if not arguments.replays and not arguments.paths_file:
+            build_parser.error("no replays given; give replays and/or `--paths_file`.")
+        if arguments.paths_file == "-":
+            build_index(iter_replay_paths(arguments.replays, sys.stdin), arguments.index_dir)
+        elif arguments.paths_file:
+            with open(arguments.paths_file) as listed_paths:
+                build_index(iter_replay_paths(arguments.replays, listed_paths),
+                            arguments.index_dir)
+        else:
+            build_index(iter_replay_paths(arguments.replays), arguments.index_dir)
+    else:
+        index = ReplayIndex(arguments.index_dir)
+        mask = np.ones(index.num_games, dtype=bool)
+        if arguments.winner is not None:
+            mask &= index.games["winner"] == arguments.winner
+        if arguments.min_planets is not None:
+            mask &= index.games["num_planets"] >= arguments.min_planets
+        if arguments.max_planets is not None:
+            mask &= index.games["num_planets"] <= arguments.max_planets
+        if arguments.ahead_at is not None:
+            mask &= (index.games["turns"] >= arguments.ahead_at) \
+                & (index.at_turn("ships_1", arguments.ahead_at)
+                   > index.at_turn("ships_2", arguments.ahead_at))
+        if arguments.behind_at is not None:
+            mask &= (index.games["turns"] >= arguments.behind_at) \
+                & (index.at_turn("ships_1", arguments.behind_at)
+                   < index.at_turn("ships_2", arguments.behind_at))
+        for path in index.paths(np.nonzero(mask)[0]):
+            print(path)
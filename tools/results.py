@@ -0,0 +1,39 @@
+"""Append-only store of game results, with one JSON object per line.
+
+Every record is flushed to disk as soon as it is written, so a long batch of
+games that is interrupted can be resumed from the games already recorded.
+"""
+
+import json
+import os
+
+
+def load_results(path: str) -> list:
+    """Return the records stored in `path`, ignoring a partially written last line."""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as results_file:
+        for line in results_file:
+            if not line.endswith("\n"):
+                break
+            records.append(json.loads(line))
+    return records
+
+
+class ResultsWriter:
+    def __init__(self, path: str):
+        # drop a partially written last line left by an interrupted run
+        if os.path.exists(path):
+            with open(path, "rb+") as results_file:
+                data = results_file.read()
+                results_file.truncate(data.rfind(b"\n") + 1)
+        self._file = open(path, "a")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
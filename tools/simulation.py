@@ -0,0 +1,196 @@
+"""Vectorized Planet Wars simulation for batched rollouts.
+
+A `BatchState` holds K independent games as struct-of-arrays NumPy buffers and
+advances all of them by one turn per call to `BatchState.step`, using the same
+departure, advancement and arrival phases as `tools/engine.py`.
+
+All games in a batch have the same number of planets P. Fleets are kept in
+fixed-capacity (K, F) buffers where a slot with no turns remaining is free; the
+capacity grows as needed.
+"""
+
+import numpy as np
+
+import tools.engine
+
+NUM_OWNERS = 3
+INITIAL_FLEET_CAPACITY = 64
+
+
+class BatchState:
+    def __init__(self, owner, num_ships, growth_rate, x, y, fleet_capacity=INITIAL_FLEET_CAPACITY):
+        """Create a batch from (K, P) arrays of planet attributes, with no fleets in flight."""
+        self.owner = np.array(owner, dtype=np.int8)
+        self.num_ships = np.array(num_ships, dtype=np.int64)
+        self.growth_rate = np.array(growth_rate, dtype=np.int64)
+        self.x = np.array(x, dtype=np.float64)
+        self.y = np.array(y, dtype=np.float64)
+        self.distances = _distances(self.x, self.y)
+
+        batch_size = self.owner.shape[0]
+        self.fleet_owner = np.zeros((batch_size, fleet_capacity), dtype=np.int8)
+        self.fleet_num_ships = np.zeros((batch_size, fleet_capacity), dtype=np.int64)
+        self.fleet_source = np.zeros((batch_size, fleet_capacity), dtype=np.int32)
+        self.fleet_destination = np.zeros((batch_size, fleet_capacity), dtype=np.int32)
+        self.fleet_total_trip_length = np.zeros((batch_size, fleet_capacity), dtype=np.int32)
+        self.fleet_turns_remaining = np.zeros((batch_size, fleet_capacity), dtype=np.int32)
+        self.turn = 0
+
+    @classmethod
+    def from_game(cls, game: tools.engine.Game, batch_size: int):
+        """Create a batch of `batch_size` copies of the current state of an engine `Game`."""
+        columns = np.array([(p.owner, p.num_ships, p.growth_rate, p.x, p.y) for p in game.planets])
+        state = cls(*(np.tile(column, (batch_size, 1)) for column in columns.T))
+        for f in game.fleets:
+            state.launch(np.arange(batch_size), np.full(batch_size, f.source),
+                         np.full(batch_size, f.destination), np.full(batch_size, f.num_ships),
+                         owner=np.full(batch_size, f.owner),
+                         turns_remaining=np.full(batch_size, f.turns_remaining),
+                         total_trip_length=np.full(batch_size, f.total_trip_length))
+        state.turn = game.turn
+        return state
+
+    @classmethod
+    def from_map(cls, map_data: str, batch_size: int):
+        return cls.from_game(tools.engine.Game(map_data), batch_size)
+
+    @property
+    def batch_size(self) -> int:
+        return self.owner.shape[0]
+
+    @property
+    def num_planets(self) -> int:
+        return self.owner.shape[1]
+
+    def copy(self):
+        state = object.__new__(BatchState)
+        for name, value in vars(self).items():
+            setattr(state, name, value.copy() if isinstance(value, np.ndarray) else value)
+        # planets never move, so the distances can be shared between copies
+        state.distances = self.distances
+        return state
+
+    def _grow_fleets(self, capacity: int):
+        for name in ("fleet_owner", "fleet_num_ships", "fleet_source", "fleet_destination",
+                     "fleet_total_trip_length", "fleet_turns_remaining"):
+            column = getattr(self, name)
+            grown = np.zeros((self.batch_size, capacity), dtype=column.dtype)
+            grown[:, :column.shape[1]] = column
+            setattr(self, name, grown)
+
+    def launch(self, game, source, destination, num_ships, owner=None, turns_remaining=None,
+               total_trip_length=None):
+        """Add fleets to free slots; the arguments are flat arrays with one entry per fleet."""
+        game = np.asarray(game, dtype=np.int64)
+        if game.size == 0:
+            return
+        if total_trip_length is None:
+            total_trip_length = self.distances[game, source, destination]
+        if turns_remaining is None:
+            turns_remaining = total_trip_length
+        if owner is None:
+            owner = self.owner[game, source]
+
+        # the rank of each fleet among the new fleets of its game picks its free slot
+        order = np.argsort(game, kind="stable")
+        sorted_games = game[order]
+        starts = np.searchsorted(sorted_games, sorted_games, side="left")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(game.size) - starts
+
+        free = self.fleet_turns_remaining == 0
+        needed = int(rank.max()) + 1
+        if needed > int(free.sum(axis=1).min()):
+            capacity = self.fleet_turns_remaining.shape[1]
+            self._grow_fleets(max(2 * capacity, capacity + needed))
+            free = self.fleet_turns_remaining == 0
+        free_slots = np.argsort(~free, axis=1, kind="stable")
+        slot = free_slots[game, rank]
+
+        self.fleet_owner[game, slot] = owner
+        self.fleet_num_ships[game, slot] = num_ships
+        self.fleet_source[game, slot] = source
+        self.fleet_destination[game, slot] = destination
+        self.fleet_total_trip_length[game, slot] = total_trip_length
+        self.fleet_turns_remaining[game, slot] = turns_remaining
+
+    def depart(self, game, source, destination, num_ships):
+        """Carry out the departure phase for a flat array of orders.
+
+        Orders are issued by the owner of the source planet. Orders from neutral
+        planets, to the source planet itself or with no ships are ignored, as are all
+        orders from a planet that sends more ships than it has.
+        """
+        game = np.asarray(game, dtype=np.int64)
+        source = np.asarray(source, dtype=np.int64)
+        destination = np.asarray(destination, dtype=np.int64)
+        num_ships = np.asarray(num_ships, dtype=np.int64)
+
+        valid = (self.owner[game, source] != tools.engine.NEUTRAL) & (source != destination) \
+            & (num_ships > 0)
+        planet_index = game * self.num_planets + source
+        sent = np.bincount(planet_index[valid], weights=num_ships[valid],
+                           minlength=self.owner.size).astype(np.int64)
+        valid &= sent[planet_index] <= self.num_ships.ravel()[planet_index]
+
+        game, source = game[valid], source[valid]
+        destination, num_ships = destination[valid], num_ships[valid]
+        np.subtract.at(self.num_ships, (game, source), num_ships)
+        self.launch(game, source, destination, num_ships)
+
+    def advance(self):
+        """Carry out the advancement phase: grow owned planets and move the fleets."""
+        self.num_ships += np.where(self.owner != tools.engine.NEUTRAL, self.growth_rate, 0)
+        in_flight = self.fleet_turns_remaining > 0
+        self.fleet_turns_remaining -= in_flight
+
+        return in_flight & (self.fleet_turns_remaining == 0)
+
+    def arrive(self, arriving):
+        """Carry out the arrival phase for the fleets in the `arriving` (K, F) mask."""
+        games, planets = np.indices(self.owner.shape)
+        forces = np.zeros(self.owner.shape + (NUM_OWNERS,), dtype=np.int64)
+        forces[games, planets, self.owner] = self.num_ships
+
+        game, slot = np.nonzero(arriving)
+        np.add.at(forces, (game, self.fleet_destination[game, slot], self.fleet_owner[game, slot]),
+                  self.fleet_num_ships[game, slot])
+        self.fleet_num_ships[game, slot] = 0
+
+        # the largest force wins and loses as many ships as the second largest force
+        # has; if the two are tied, the original owner keeps the planet with no ships
+        ranked = np.sort(forces, axis=2)
+        first, second = ranked[:, :, -1], ranked[:, :, -2]
+        tied = first == second
+        self.owner = np.where(tied, self.owner, forces.argmax(axis=2)).astype(np.int8)
+        self.num_ships = first - second
+
+    def step(self, game=(), source=(), destination=(), num_ships=()):
+        """Advance every game in the batch by one turn given a flat array of orders."""
+        self.depart(game, source, destination, num_ships)
+        self.arrive(self.advance())
+        self.turn += 1
+
+    def player_ships(self) -> np.ndarray:
+        """Return the (K, 3) total number of ships of each owner, on planets and in fleets."""
+        ships = np.zeros((self.batch_size, NUM_OWNERS), dtype=np.int64)
+        games = np.indices(self.owner.shape)[0]
+        np.add.at(ships, (games, self.owner), self.num_ships)
+        games = np.indices(self.fleet_owner.shape)[0]
+        np.add.at(ships, (games, self.fleet_owner), self.fleet_num_ships)
+        return ships
+
+    def alive(self) -> np.ndarray:
+        """Return the (K, 3) mask of which owners have any planets or fleets."""
+        alive = np.zeros((self.batch_size, NUM_OWNERS), dtype=bool)
+        games = np.indices(self.owner.shape)[0]
+        alive[games, self.owner] = True
+        in_flight = self.fleet_turns_remaining > 0
+        alive[np.nonzero(in_flight)[0], self.fleet_owner[in_flight]] = True
+        return alive
+
+
+def _distances(x, y) -> np.ndarray:
+    dx = x[:, :, np.newaxis] - x[:, np.newaxis, :]
+    dy = y[:, :, np.newaxis] - y[:, np.newaxis, :]
+    return np.ceil(np.sqrt(dx * dx + dy * dy)).astype(np.int32)
@@ -0,0 +1,69 @@
+"""Elo estimates and sequential probability ratio tests for head-to-head matches.
+
+The log-likelihood ratio uses the usual normal approximation of the trinomial
+(win/draw/loss) model, so a match can stop as soon as it is decided rather than
+after a fixed number of games.
+"""
+
+import math
+
+
+def elo_to_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score: float) -> float:
+    # keep perfect scores finite
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def _score_and_variance(wins: int, draws: int, losses: int) -> tuple:
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    if variance == 0 and (wins or losses):
+        # every game had the same decisive result; count one extra draw so that
+        # the variance (and with it the estimates) stay finite
+        return _score_and_variance(wins, draws + 1, losses)
+    return score, variance
+
+
+def elo_estimate(wins: int, draws: int, losses: int, z: float = 1.96) -> tuple:
+    """Return the Elo difference and its confidence interval as (low, elo, high)."""
+    games = wins + draws + losses
+    if games == 0:
+        return -math.inf, 0.0, math.inf
+    score, variance = _score_and_variance(wins, draws, losses)
+    margin = z * math.sqrt(variance / games)
+    return score_to_elo(score - margin), score_to_elo(score), score_to_elo(score + margin)
+
+
+def log_likelihood_ratio(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """Return the log-likelihood ratio of H1 (Elo difference `elo1`) against H0 (`elo0`)."""
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+    score, variance = _score_and_variance(wins, draws, losses)
+    if variance == 0:
+        return 0.0
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple:
+    """Return the (lower, upper) log-likelihood ratio bounds for the given error rates."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def sprt_decision(wins: int, draws: int, losses: int, elo0: float, elo1: float,
+                  alpha: float = 0.05, beta: float = 0.05):
+    """Return "H0" or "H1" once the test accepts one of them, otherwise None."""
+    llr = log_likelihood_ratio(wins, draws, losses, elo0, elo1)
+    lower, upper = sprt_bounds(alpha, beta)
+    if llr >= upper:
+        return "H1"
+    if llr <= lower:
+        return "H0"
+    return None
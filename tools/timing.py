@@ -0,0 +1,46 @@
+"""Summaries of the per-turn timings recorded by `tools/engine.py`."""
+
+import math
+
+# turns taking more than this fraction of their time budget are counted as close calls
+BUDGET_WARNING_FRACTION = 0.8
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Return the nearest-rank percentile of `values`, which must be sorted."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def _mean(values: list):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(timings: list) -> dict:
+    """Summarize a list of `tools.engine.TurnTiming`s."""
+    latencies = sorted(t.latency for t in timings)
+    return {
+        "turns": len(timings),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else 0.0,
+        "over_budget": sum(t.latency > BUDGET_WARNING_FRACTION * t.budget for t in timings),
+        "parse": _mean([t.parse for t in timings]),
+        "think": _mean([t.think for t in timings]),
+        "write": _mean([t.write for t in timings]),
+    }
+
+
+def format_summary(summary: dict) -> str:
+    line = (f"{summary['turns']} turns, p50 {summary['p50']:.1f} ms, "
+            f"p95 {summary['p95']:.1f} ms, p99 {summary['p99']:.1f} ms, "
+            f"max {summary['max']:.1f} ms, "
+            f"{summary['over_budget']} over {BUDGET_WARNING_FRACTION:.0%} of budget")
+    if summary["think"] is not None:
+        line += (f" (mean parse {summary['parse']:.1f} ms, think {summary['think']:.1f} ms, "
+                 f"write {summary['write'] or 0.0:.1f} ms)")
+    return line
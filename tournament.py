@@ -0,0 +1,198 @@
+import argparse
+import glob
+import itertools
+import os
+import random
+
+import tools.engine
+import tools.map_generator_v2
+import tools.map_store
+import tools.play_utils
+import tools.ratings
+import tools.results
+
+
+def load_maps(patterns, generated, seed, map_store="", map_filters=None):
+    maps = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path) as map_file:
+                maps.append((os.path.basename(path), map_file.read()))
+    for map_seed in range(seed, seed + generated):
+        maps.append((f"seed{map_seed}", tools.map_generator_v2.generate_map(map_seed)))
+    if map_store:
+        for stored_map in tools.map_store.MapStore(map_store).select(
+                **tools.map_store.parse_filters(map_filters)):
+            maps.append((stored_map.name, stored_map.map_data))
+    return maps
+
+
+def play_game(game_id, map_name, map_data, bot_one, bot_two, command_one, command_two,
+              max_turn_time, max_num_turns, cold_start):
+    game = tools.engine.Game(map_data, max_turn_time, max_num_turns)
+    bot_pool = None if cold_start else tools.play_utils.worker_bot_pool()
+    result = game.play(command_one, command_two, cpus=tools.play_utils.worker_cpus,
+                       bot_pool=bot_pool)
+    return {
+        "game": game_id,
+        "map": map_name,
+        "player_one": bot_one,
+        "player_two": bot_two,
+        "winner": result.winner,
+        "verdict": result.verdict,
+        "turns": result.turns,
+        "errors": result.errors,
+    }
+
+
+def play_game_star(game_arguments):
+    return play_game(*game_arguments)
+
+
+def round_robin_pairings(bots, maps):
+    # every pair of bots plays on every map from both sides
+    for bot_one, bot_two in itertools.combinations(bots, 2):
+        for map_name, map_data in maps:
+            yield bot_one, bot_two, map_name, map_data
+            yield bot_two, bot_one, map_name, map_data
+
+
+def swiss_pairings(bots, points, played, map_name, map_data):
+    # pair bots with similar points that have not played each other yet where
+    # possible; with an odd number of bots the lowest ranked one sits out
+    standings = sorted(bots, key=lambda bot: (-points[bot], random.random()))
+    unpaired = standings[:len(standings) - len(standings) % 2]
+    while unpaired:
+        bot_one = unpaired.pop(0)
+        bot_two = next((bot for bot in unpaired if (bot_one, bot) not in played), unpaired[0])
+        unpaired.remove(bot_two)
+        played.update(((bot_one, bot_two), (bot_two, bot_one)))
+        yield bot_one, bot_two, map_name, map_data
+        yield bot_two, bot_one, map_name, map_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Play a round-robin or Swiss tournament between Planet Wars bots.")
+    parser.add_argument(
+        "--format", action="store", default="round_robin", choices=("round_robin", "swiss"),
+        help="how the games are paired.", dest="format")
+    parser.add_argument(
+        "--rounds", action="store", default=None, type=int,
+        help="number of rounds of a Swiss tournament (default: one per map).", dest="rounds")
+    parser.add_argument(
+        "--maps", action="append", default=None, type=str,
+        help="map file (or glob pattern) to play on; can be given several times "
+             "(default: maps/map*.txt, unless `--map_store` is given).", dest="maps")
+    parser.add_argument(
+        "--generated", action="store", default=0, type=int,
+        help="number of maps to generate in addition to `--maps`.", dest="generated")
+    parser.add_argument(
+        "--seed", action="store", default=0, type=int,
+        help="seed of the first generated map.", dest="seed")
+    parser.add_argument(
+        "--map_store", action="store", default="", type=str,
+        help="store of maps (see `tools/map_store.py`) whose maps are also played on.",
+        dest="map_store")
+    parser.add_argument(
+        "--map_filter", action="append", default=None, type=str,
+        help="\"<feature>=<value>\", \"min_<feature>=<value>\" or \"max_<feature>=<value>\" "
+             "that the maps from the `--map_store` must match; can be given several times.",
+        dest="map_filters")
+    parser.add_argument(
+        "--max_turn_time", action="store", default=1000, type=int,
+        help="maximum time (in ms) that a bot can have on its turn.", dest="max_turn_time")
+    parser.add_argument(
+        "--max_num_turns", action="store", default=200, type=int,
+        help="maximum number of turns that a game can last.", dest="max_num_turns")
+    parser.add_argument(
+        "--manual_commands", action="store_true", dest="manual_commands",
+        help="use the `bots` values directly as commands instead of automatically "
+             "determining commands from the filenames.")
+    parser.add_argument(
+        "--jobs", action="store", default=max(1, len(tools.play_utils.available_cpus()) // 2),
+        type=int, help="number of games to play in parallel (default: one per two CPUs, so "
+                       "that every bot gets its own CPU).", dest="jobs")
+    parser.add_argument(
+        "--cold_start", action="store_true", dest="cold_start",
+        help="start new bot processes for every game instead of keeping the bots that support "
+             "sessions (see `tools/engine.py`) alive between games.")
+    parser.add_argument(
+        "--results", action="store", default="", type=str,
+        help="file to append the result of every game to, one JSON object per line.",
+        dest="results")
+    parser.add_argument(
+        "bots", action="store", type=str, nargs="+", help="bots to play in the tournament.")
+    arguments = parser.parse_args()
+
+    if len(set(arguments.bots)) < 2:
+        parser.error("a tournament needs at least two different bots.")
+    bots = list(dict.fromkeys(arguments.bots))
+    if arguments.manual_commands:
+        commands = {bot: bot for bot in bots}
+    else:
+        commands = tools.play_utils.resolve_all(bots)
+
+    default_maps = [] if arguments.map_store else ["maps/map*.txt"]
+    maps = load_maps(arguments.maps or default_maps, arguments.generated, arguments.seed,
+                     arguments.map_store, arguments.map_filters)
+    if not maps:
+        parser.error("no maps to play on.")
+
+    # (wins, draws, losses) of every bot
+    records = {bot: [0, 0, 0] for bot in bots}
+    points = {bot: 0.0 for bot in bots}
+    rating_results = []
+    results_writer = tools.results.ResultsWriter(arguments.results) if arguments.results else None
+    pool = tools.play_utils.create_pool(arguments.jobs)
+
+    if arguments.format == "round_robin":
+        rounds = [list(round_robin_pairings(bots, maps))]
+    else:
+        rounds = range(arguments.rounds or len(maps))
+    played = set()
+    game_id = 0
+
+    for round_pairings in rounds:
+        if arguments.format == "swiss":
+            map_name, map_data = maps[round_pairings % len(maps)]
+            round_pairings = list(swiss_pairings(bots, points, played, map_name, map_data))
+
+        games = []
+        for bot_one, bot_two, map_name, map_data in round_pairings:
+            games.append((game_id, map_name, map_data, bot_one, bot_two, commands[bot_one],
+                          commands[bot_two], arguments.max_turn_time, arguments.max_num_turns,
+                          arguments.cold_start))
+            game_id += 1
+
+        for record in pool.imap_unordered(play_game_star, games):
+            if results_writer:
+                results_writer.write(record)
+            bot_one, bot_two = record["player_one"], record["player_two"]
+            # index of the result of `bot_one` in its (wins, draws, losses)
+            outcome = {tools.engine.PLAYER_ONE: 0, tools.engine.NEUTRAL: 1,
+                       tools.engine.PLAYER_TWO: 2}[record["winner"]]
+            records[bot_one][outcome] += 1
+            records[bot_two][2 - outcome] += 1
+            score = (2 - outcome) / 2
+            rating_results.append((bot_one, bot_two, score))
+            points[bot_one] += score
+            points[bot_two] += 1 - score
+            print(f"Game {record['game'] + 1} on {record['map']}: {bot_one} vs {bot_two}: "
+                  f"{record['verdict']}")
+
+    pool.close()
+    pool.join()
+    if results_writer:
+        results_writer.close()
+
+    ratings = tools.ratings.elo_ratings(bots, rating_results)
+    name_width = max(len(bot) for bot in bots)
+    print("---")
+    print(f"  {'Rank':>4}  {'Bot':<{name_width}}  {'Elo':>7}  {'Games':>5}  {'W-D-L':>11}  Score")
+    for rank, bot in enumerate(sorted(bots, key=ratings.get, reverse=True), 1):
+        wins, draws, losses = records[bot]
+        games_played = wins + draws + losses
+        score = points[bot] / games_played if games_played else 0.0
+        print(f"  {rank:>4}  {bot:<{name_width}}  {ratings[bot]:>7.1f}  {games_played:>5}  "
+              f"{f'{wins}-{draws}-{losses}':>11}  {score:.1%}")
@@ -0,0 +1,180 @@
+"""Render a playback to PNG images without a browser.
+
+Reads a playback string on standard input, like `visualize_locally.py`, and
+writes a chart of the ships and production of both players and/or one image
+per turn, drawn like the page of the visualizer. Only the standard library is
+used, so this also works on machines without a display or a browser:
+
+    python3 -m tools.replay game.pwr | python3 visualizer/headless.py --chart chart.png
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import zlib
+
+if __package__:
+    from visualizer.visualize_locally import parse_playback, summarize, turn_state
+else:
+    # run as a script, like `visualize_locally.py`, with this directory on the path
+    from visualize_locally import parse_playback, summarize, turn_state
+
+SIZE = 640
+CHART_HEIGHT = 100
+MARGIN = 35
+# radius in pixels of the planets of each growth rate
+PLANET_PIXELS = [7, 10, 13, 17, 23, 29]
+TEAM_COLORS = [(0x33, 0x44, 0x44), (0xaa, 0x00, 0x00), (0x55, 0x88, 0xaa)]
+# the page draws production with 40% opacity on black
+PRODUCTION_COLORS = [(77, 0, 0), (45, 64, 96)]
+BACKGROUND = (0, 0, 0)
+WHITE = (0xff, 0xff, 0xff)
+
+# 3x5 bitmaps of the digits, for the ship counts
+DIGITS = {
+    "0": ("111", "101", "101", "101", "111"),
+    "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"),
+    "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"),
+    "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"),
+    "7": ("111", "001", "001", "001", "001"),
+    "8": ("111", "101", "111", "101", "111"),
+    "9": ("111", "101", "111", "001", "111"),
+}
+
+
+class Image:
+    def __init__(self, width, height, color=BACKGROUND):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(color) * (width * height))
+
+    def fill_span(self, y, x0, x1, color):
+        # fill the pixels from x0 to x1 (inclusive) of row y
+        if not 0 <= y < self.height:
+            return
+        x0, x1 = max(0, x0), min(self.width - 1, x1)
+        if x0 <= x1:
+            start = 3 * (y * self.width + x0)
+            self.pixels[start:start + 3 * (x1 - x0 + 1)] = bytes(color) * (x1 - x0 + 1)
+
+    def fill_circle(self, cx, cy, radius, color):
+        cx, cy = round(cx), round(cy)
+        for dy in range(-radius, radius + 1):
+            dx = math.isqrt(radius * radius - dy * dy)
+            self.fill_span(cy + dy, cx - dx, cx + dx, color)
+
+    def line(self, x0, y0, x1, y1, color):
+        steps = max(1, round(max(abs(x1 - x0), abs(y1 - y0))))
+        for i in range(steps + 1):
+            x = round(x0 + (x1 - x0) * i / steps)
+            y = round(y0 + (y1 - y0) * i / steps)
+            self.fill_span(y, x, x, color)
+
+    def text(self, cx, cy, text, color=WHITE, scale=2):
+        # draw the digits of `text` centered on (cx, cy)
+        width = (4 * len(text) - 1) * scale
+        left, top = round(cx - width / 2), round(cy - 5 * scale / 2)
+        for i, character in enumerate(text):
+            for row, bits in enumerate(DIGITS.get(character, ())):
+                for column, bit in enumerate(bits):
+                    if bit == "1":
+                        x = left + (4 * i + column) * scale
+                        for y in range(top + row * scale, top + (row + 1) * scale):
+                            self.fill_span(y, x, x + scale - 1, color)
+
+    def save(self, path):
+        rows = b"".join(
+            b"\0" + self.pixels[3 * y * self.width:3 * (y + 1) * self.width]
+            for y in range(self.height))
+
+        def chunk(kind, body):
+            return (struct.pack(">I", len(body)) + kind + body
+                    + struct.pack(">I", zlib.crc32(kind + body)))
+
+        with open(path, "wb") as png_file:
+            png_file.write(b"\x89PNG\r\n\x1a\n"
+                           + chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height,
+                                                        8, 2, 0, 0, 0))
+                           + chunk(b"IDAT", zlib.compress(bytes(rows), 6))
+                           + chunk(b"IEND", b""))
+
+
+def _projection(planets):
+    # map coordinates to pixels so that the map is centered and fills the image
+    xs, ys = [p[0] for p in planets], [p[1] for p in planets]
+    extent = max(max(xs) - min(xs), max(ys) - min(ys)) or 1
+    scale = (SIZE - 2 * MARGIN) / extent
+    offset_x = MARGIN - min(xs) * scale + (extent - (max(xs) - min(xs))) / 2 * scale
+    offset_y = MARGIN - min(ys) * scale + (extent - (max(ys) - min(ys))) / 2 * scale
+    return lambda x, y: (x * scale + offset_x, SIZE - (y * scale + offset_y))
+
+
+def render_turn(planets, planet_states, fleets, project=None):
+    """Draw the planets, with their owners and ships, and the fleets of a turn."""
+    project = project or _projection(planets)
+    image = Image(SIZE, SIZE)
+    for (x, y, _, _, growth_rate), (owner, num_ships) in zip(planets, planet_states):
+        px, py = project(x, y)
+        image.fill_circle(px, py, PLANET_PIXELS[growth_rate], TEAM_COLORS[owner])
+        image.text(px, py, str(num_ships))
+    for owner, num_ships, source, destination, total_trip_length, turns_remaining in fleets:
+        progress = (total_trip_length - turns_remaining + 1) / (total_trip_length + 2)
+        x0, y0 = project(*planets[source][:2])
+        x1, y1 = project(*planets[destination][:2])
+        px, py = x0 + (x1 - x0) * progress, y0 + (y1 - y0) * progress
+        image.fill_circle(px, py, 4, TEAM_COLORS[owner])
+        image.text(px, py - 12, str(num_ships), scale=1)
+    return image
+
+
+def render_chart(ships, production, width=SIZE, height=CHART_HEIGHT):
+    """Draw the ships and production of both players over the game like the page's chart."""
+    image = Image(width, height)
+    x_scale = width / max(200, len(ships))
+    # the smallest scales of the graphs are those of the page too
+    for values, colors, least in ((production, PRODUCTION_COLORS, 5),
+                                  (ships, TEAM_COLORS[1:], 100)):
+        y_scale = height / max([least] + [max(v) for v in values]) / 1.05
+        for player, color in enumerate(colors):
+            for turn in range(1, len(values)):
+                image.line((turn - 1) * x_scale, height - 1 - values[turn - 1][player] * y_scale,
+                           turn * x_scale, height - 1 - values[turn][player] * y_scale, color)
+    return image
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render a playback read on standard input to PNG images.")
+    parser.add_argument(
+        "--chart", action="store", default="", type=str,
+        help="file to write the chart of the ships and production of both players to.",
+        dest="chart")
+    parser.add_argument(
+        "--frames_dir", action="store", default="", type=str,
+        help="directory to write an image of every shown turn to, as turnN.png.",
+        dest="frames_dir")
+    parser.add_argument(
+        "--every", action="store", default=1, type=int,
+        help="only write an image of every this many turns.", dest="every")
+    arguments = parser.parse_args()
+    if not arguments.chart and not arguments.frames_dir:
+        parser.error("nothing to render; give `--chart` and/or `--frames_dir`.")
+
+    planets, turns = parse_playback(sys.stdin.readline())
+    if arguments.chart:
+        render_chart(*summarize(planets, turns)).save(arguments.chart)
+    if arguments.frames_dir:
+        os.makedirs(arguments.frames_dir, exist_ok=True)
+        project = _projection(planets)
+        for turn in range(0, len(turns) + 1, arguments.every):
+            if turn == 0:
+                planet_states, fleets = [(p[2], p[3]) for p in planets], []
+            else:
+                planet_states, fleets = turn_state(turns[turn - 1], len(planets))
+            image = render_turn(planets, planet_states, fleets, project)
+            image.save(os.path.join(arguments.frames_dir, f"turn{turn}.png"))
@@ -54,6 +54,15 @@ const Visualizer = {
     map_id: 0,
     planets: [],
     moves: [],
+    numMoves: 0,
+    // Turns written by visualize_locally.py are loaded from chunkPath in
+    // chunks of chunkTurns turns as they are shown, see getMove().
+    chunkTurns: 0,
+    chunkPath: '',
+    chunks: {},
+    requestedChunks: {},
+    summary: null, // ships and production of both players on every move
+    chartImage: null,
     error_message: '',
     dirtyRegions: [],
     active_planet: -1,
@@ -81,6 +90,9 @@ const Visualizer = {
 
         // Parse data
         this.parseData(data);
+        if (this.summary === null) {
+            this.computeSummary();
+        }
 
         // Calculate offset and range so the map is centered and fills the area
         let max_coords = {x: -999, y: -999};
@@ -160,11 +172,15 @@ const Visualizer = {
         let display_y = 0;
 
         let frameNumber = Math.floor(frame);
-        if (frameNumber >= this.moves.length)
-            frameNumber = this.moves.length - 1;
+        if (frameNumber >= this.numMoves)
+            frameNumber = this.numMoves - 1;
 
-        const planetStats = this.moves[frameNumber].planets;
-        const fleets = this.moves[frameNumber].moving;
+        const move = this.getMove(frameNumber);
+        if (move === null) {
+            return false; // addChunk() draws the frame once it is loaded
+        }
+        const planetStats = move.planets;
+        const fleets = move.moving;
         const numShips = [0, 0];
         const production = [0, 0];
 
@@ -303,93 +319,146 @@ const Visualizer = {
             // '<a href="profile.php?user_id=' + Visualizer.playerIds[1] + '">' +
             '<a>' + Visualizer.players[1] + '</a><br />' + numShips[1] + ' (+' + production[1] + ')');
         $('.player2Name a').css({'color': Visualizer.config.teamColor[2], 'text-decoration': 'none'})
+        return true;
+    },
+
+    getMove: function (frameNumber) {
+        // Returns the move shown on the given frame, or null if its turns are
+        // still being loaded.
+        if (this.moves[frameNumber] === undefined) {
+            const chunk = Math.floor((frameNumber - 1) / this.chunkTurns);
+            if (!(chunk in this.chunks)) {
+                this.loadChunk(chunk);
+                return null;
+            }
+            this.parseTurns(this.chunks[chunk], 1 + chunk * this.chunkTurns);
+            delete this.chunks[chunk];
+        }
+
+        // Load the next chunk before playback reaches it
+        if (this.chunkTurns > 0 && frameNumber > 0
+                && (frameNumber - 1) % this.chunkTurns >= this.chunkTurns / 2) {
+            const next = Math.floor((frameNumber - 1) / this.chunkTurns) + 1;
+            if (1 + next * this.chunkTurns < this.numMoves) {
+                this.loadChunk(next);
+            }
+        }
+        return this.moves[frameNumber];
+    },
+
+    loadChunk: function (chunk) {
+        if (chunk in this.requestedChunks) {
+            return;
+        }
+        this.requestedChunks[chunk] = true;
+        const script = document.createElement('script');
+        script.src = this.chunkPath + 'turns' + chunk + '.js';
+        document.body.appendChild(script);
+    },
+
+    addChunk: function (chunk, turns) {
+        // Called by the files of turns when they are loaded.
+        this.chunks[chunk] = turns;
+        const frameNumber = Math.floor(this.frame);
+        if (chunk * this.chunkTurns < frameNumber && frameNumber <= (chunk + 1) * this.chunkTurns) {
+            this.drawFrame(this.frame);
+        }
     },
 
     drawChart: function (frame) {
         const canvas = document.getElementById('chart');
         const ctx = canvas.getContext('2d');
-        ctx.lineWidth = 1.3;
 
-        // This allows us to restore scale and translate
-        ctx.restore();
-        ctx.save();
+        // The graphs do not change during the game, so they are only drawn once
+        if (this.chartImage === null) {
+            this.chartImage = this.renderChart(canvas.width, canvas.height);
+        }
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        ctx.drawImage(this.chartImage, 0, 0);
+
+        // Draw move indicator
+        if (typeof frame != "undefined") {
+            const widthFactor = canvas.width / Math.max(200, this.numMoves);
+            ctx.lineWidth = 1.3;
+            ctx.strokeStyle = "#666666";
+            ctx.fillStyle = "#666666";
+            ctx.beginPath();
+            ctx.moveTo(widthFactor * frame, 0);
+            ctx.lineTo(widthFactor * frame, canvas.height);
+            ctx.stroke();
+        }
+    },
 
+    renderChart: function (width, height) {
+        const canvas = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        const ctx = canvas.getContext('2d');
+        ctx.lineWidth = 1.3;
         ctx.scale(1, -1);
         ctx.translate(0, -canvas.height);
-        ctx.clearRect(0, 0, canvas.width, canvas.height);
 
-        // Total the ship counts
+        const ships = this.summary.ships;
+        const production = this.summary.production;
         let mostShips = 100;
         let mostProduction = 5;
-        for (let i = 0; i < this.moves.length; i++) {
-            const turn = this.moves[i];
-
-            turn.shipCount = [0, 0, 0];
-            turn.prodCount = [0, 0, 0];
-
-            for (let j = 0; j < turn.moving.length; j++) {
-                const fleet = turn.moving[j];
-                turn.shipCount[fleet.owner] += fleet.numShips
-            }
-
-            for (let j = 0; j < turn.planets.length; j++) {
-                const planet = turn.planets[j];
-                turn.shipCount[planet.owner] += planet.numShips;
-                turn.prodCount[planet.owner] += this.planets[j].growthRate;
-            }
-
-            for (let j = 0; j < turn.shipCount.length; j++) {
-                mostShips = Math.max(mostShips, turn.shipCount[j])
-            }
-
-            for (let j = 0; j < turn.prodCount.length; j++) {
-                mostProduction = Math.max(mostProduction, turn.prodCount[j])
-            }
+        for (let i = 0; i < ships.length; i++) {
+            mostShips = Math.max(mostShips, ships[i][0], ships[i][1]);
+            mostProduction = Math.max(mostProduction, production[i][0], production[i][1]);
         }
 
         // Draw production graph
         let heightFactor = canvas.height / mostProduction / 1.05;
-        let widthFactor = canvas.width / Math.max(200, this.moves.length);
+        const widthFactor = canvas.width / Math.max(200, this.numMoves);
         for (let i = 1; i <= 2; i++) {
             ctx.strokeStyle = this.config.planetColor[i];
             ctx.fillStyle = this.config.planetColor[i];
             ctx.beginPath();
-            ctx.moveTo(0, this.moves[0].prodCount[i] * heightFactor);
-            for (let j = 1; j < this.moves.length; j++) {
-                const prodCount = this.moves[j].prodCount[i];
-                ctx.lineTo(j * widthFactor, prodCount * heightFactor)
+            ctx.moveTo(0, production[0][i - 1] * heightFactor);
+            for (let j = 1; j < production.length; j++) {
+                ctx.lineTo(j * widthFactor, production[j][i - 1] * heightFactor)
             }
             ctx.stroke();
-
-            ctx.beginPath();
         }
 
         heightFactor = canvas.height / mostShips / 1.05;
-        widthFactor = canvas.width / Math.max(200, this.moves.length);
         for (let i = 1; i <= 2; i++) {
             ctx.strokeStyle = this.config.teamColor[i];
             ctx.fillStyle = this.config.teamColor[i];
             ctx.beginPath();
-            ctx.moveTo(0, this.moves[0].shipCount[i] * heightFactor);
-            for (let j = 1; j < this.moves.length; j++) {
-                const shipCount = this.moves[j].shipCount[i];
-                ctx.lineTo(j * widthFactor, shipCount * heightFactor)
+            ctx.moveTo(0, ships[0][i - 1] * heightFactor);
+            for (let j = 1; j < ships.length; j++) {
+                ctx.lineTo(j * widthFactor, ships[j][i - 1] * heightFactor)
             }
             ctx.stroke();
-
-            ctx.beginPath();
         }
+        return canvas;
+    },
 
-        // Draw move indicator
-        if (typeof frame != "undefined") {
-            widthFactor = canvas.width / Math.max(200, this.moves.length);
-            ctx.strokeStyle = "#666666";
-            ctx.fillStyle = "#666666";
-            ctx.beginPath();
-            ctx.moveTo(widthFactor * frame, 0);
-            ctx.lineTo(widthFactor * frame, canvas.height);
-            ctx.stroke();
+    computeSummary: function () {
+        // Totals the ships and production of both players on every move.
+        const ships = [];
+        const production = [];
+        for (let i = 0; i < this.moves.length; i++) {
+            const turn = this.moves[i];
+            const shipCount = [0, 0, 0];
+            const prodCount = [0, 0, 0];
+
+            for (let j = 0; j < turn.moving.length; j++) {
+                const fleet = turn.moving[j];
+                shipCount[fleet.owner] += fleet.numShips
+            }
+
+            for (let j = 0; j < turn.planets.length; j++) {
+                const planet = turn.planets[j];
+                shipCount[planet.owner] += planet.numShips;
+                prodCount[planet.owner] += this.planets[j].growthRate;
+            }
+
+            ships.push(shipCount.slice(1));
+            production.push(prodCount.slice(1));
         }
+        this.summary = {ships: ships, production: production};
     },
 
     start: function () {
@@ -407,8 +476,8 @@ const Visualizer = {
     },
 
     run: function () {
-        if (this.frame > Visualizer.moves.length - 1) {
-            this.frame = Visualizer.moves.length - 1;
+        if (this.frame > Visualizer.numMoves - 1) {
+            this.frame = Visualizer.numMoves - 1;
             this.drawFrame(this.frame);
             this.stop();
         }
@@ -419,7 +488,12 @@ const Visualizer = {
         if (this.frameDrawEnded != null) {
             this.frame += (this.frameDrawStarted - this.frameDrawEnded) / 1000 * this.turnsPerSecond;
         }
-        this.drawFrame(this.frame);
+        if (!this.drawFrame(this.frame)) {
+            // Wait for the turns to be loaded rather than skip over them
+            this.frameDrawEnded = null;
+            setTimeout(function () { Visualizer.run.apply(Visualizer); }, 10);
+            return;
+        }
         this.frameDrawEnded = new Date().getTime();
         this.frame += (this.frameDrawEnded - this.frameDrawStarted) / 1000 * this.turnsPerSecond;
 
@@ -427,10 +501,21 @@ const Visualizer = {
     },
 
     setFrame: function (targetFrame) {
-        this.frame = Math.max(0, Math.min(this.moves.length - 1, Math.floor(targetFrame)));
+        this.frame = Math.max(0, Math.min(this.numMoves - 1, Math.floor(targetFrame)));
     },
 
     parseData: function (input) {
+        if (typeof input === 'object') {
+            // Paged data written by visualize_locally.py, whose turns are
+            // loaded as they are shown
+            this.parsePlanets(input.planets);
+            this.numMoves = input.numTurns + 1;
+            this.chunkTurns = input.chunkTurns;
+            this.chunkPath = input.chunkPath;
+            this.summary = {ships: input.ships, production: input.production};
+            return;
+        }
+
         input = input.split(/\n/);
 
         let data;
@@ -466,9 +551,19 @@ const Visualizer = {
         }
 
         data = data.split('|');
+        this.parsePlanets(data[0]);
+
+        // turns: [(owner,numShips)]
+        // ++ [(owner,numShips,sourcePlanet,destinationPlanet,totalTripLength,turnsRemaining)]
+        if (data.length >= 2) {
+            this.parseTurns(data[1], 1);
+        }
+        this.numMoves = this.moves.length;
+    },
 
+    parsePlanets: function (data) {
         // planets: [(x,y,owner,numShips,growthRate)]
-        this.planets = data[0].split(':').map(ParserUtils.parsePlanet);
+        this.planets = data.split(':').map(ParserUtils.parsePlanet);
 
         // insert planets as first move
         this.moves.push({
@@ -481,13 +576,10 @@ const Visualizer = {
             }),
             'moving': []
         });
+    },
 
-        // turns: [(owner,numShips)]
-        // ++ [(owner,numShips,sourcePlanet,destinationPlanet,totalTripLength,turnsRemaining)]
-        if (data.length < 2) {
-            return // No turns.
-        }
-        const turns = data[1].split(':');
+    parseTurns: function (data, firstMove) {
+        const turns = data.split(':');
         for (let i = 0; i < turns.length; i++) {
             const turn = turns[i].split(',');
             const move = {};
@@ -499,7 +591,7 @@ const Visualizer = {
             }
             move.moving = fleet_strings.map(ParserUtils.parseFleet);
 
-            this.moves.push(move);
+            this.moves[firstMove + i] = move;
         }
     },
 
@@ -551,7 +643,7 @@ const Visualizer = {
 
     const playAction = function () {
         if (!Visualizer.playing) {
-            if (Visualizer.frame > Visualizer.moves.length - 2) {
+            if (Visualizer.frame > Visualizer.numMoves - 2) {
                 Visualizer.setFrame(0);
             }
             Visualizer.start();
@@ -570,7 +662,7 @@ const Visualizer = {
     });
 
     $('#end-button').click(function () {
-        Visualizer.setFrame(Visualizer.moves.length - 1);
+        Visualizer.setFrame(Visualizer.numMoves - 1);
         Visualizer.drawFrame(Visualizer.frame);
         Visualizer.stop();
         return false;
@@ -625,7 +717,7 @@ const Visualizer = {
 
     const updateMove = function (evt) {
         const chart = $("#chart");
-        const move = Math.max(200, Visualizer.moves.length) * (evt.pageX - chart.offset().left) / chart.width();
+        const move = Math.max(200, Visualizer.numMoves) * (evt.pageX - chart.offset().left) / chart.width();
         Visualizer.setFrame(move);
         Visualizer.drawFrame(Visualizer.frame);
         Visualizer.stop();
@@ -659,7 +751,7 @@ const Visualizer = {
     })
 
     display.bind('drawn', function () {
-        $('#turnCounter').text('Turn: ' + Math.floor(Visualizer.frame) + ' of ' + (Visualizer.moves.length - 1))
+        $('#turnCounter').text('Turn: ' + Math.floor(Visualizer.frame) + ' of ' + (Visualizer.numMoves - 1))
     });
 
     $('#error_message').text(Visualizer.error_message).css({'color': Visualizer.config.teamColor[1]});
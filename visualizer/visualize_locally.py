@@ -1,28 +1,96 @@
+import json
 import os
 import re
+import shutil
 import webbrowser
 
+# number of turns in each of the files that the page loads as they are needed
+CHUNK_TURNS = 100
+
+
+def parse_playback(data):
+    """Split a playback string into its planets (x, y, owner, ships, growth) and turn strings."""
+    planets_data, _, turns_data = data.strip().partition("|")
+    planets = []
+    for planet in planets_data.split(":"):
+        x, y, owner, num_ships, growth_rate = planet.split(",")
+        planets.append((float(x), float(y), int(owner), int(num_ships), int(growth_rate)))
+    turns = turns_data.split(":") if turns_data else []
+    return planets, turns
+
+
+def turn_state(turn, num_planets):
+    """Return the (owner, ships) of every planet and the fleets of a turn string."""
+    items = turn.split(",")
+    planets = [tuple(int(value) for value in item.split(".")) for item in items[:num_planets]]
+    fleets = [tuple(int(value) for value in item.split(".")) for item in items[num_planets:]
+              if item]
+    return planets, fleets
+
+
+def summarize(planets, turns):
+    """Return the ships and production of both players at the start and after every turn."""
+    initial_state = ([(p[2], p[3]) for p in planets], [])
+    ships = []
+    production = []
+    for planet_states, fleets in [initial_state] + [turn_state(t, len(planets)) for t in turns]:
+        turn_ships = [0, 0, 0]
+        turn_production = [0, 0, 0]
+        for (owner, num_ships), planet in zip(planet_states, planets):
+            turn_ships[owner] += num_ships
+            turn_production[owner] += planet[4]
+        for fleet in fleets:
+            turn_ships[fleet[0]] += fleet[1]
+        ships.append(turn_ships[1:])
+        production.append(turn_production[1:])
+    return ships, production
+
 
 def generate(data, save_path):
+    """Write the page showing the playback `data` to `save_path`.
+
+    The page only holds the map and the chart; the turns are written in chunks
+    of `CHUNK_TURNS` turns to a directory next to it, which the page loads as
+    they are shown, so even very long games open immediately.
+    """
     path = os.path.dirname(__file__)
     template_path = os.path.join(path, "index.php")
     with open(template_path, "r") as template:
         content = template.read()
 
+    planets, turns = parse_playback(data)
+    ships, production = summarize(planets, turns)
+    chunk_dir = os.path.splitext(save_path)[0] + "_turns"
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    os.makedirs(chunk_dir)
+    for chunk, start in enumerate(range(0, len(turns), CHUNK_TURNS)):
+        with open(os.path.join(chunk_dir, f"turns{chunk}.js"), "w") as chunk_file:
+            chunk_file.write("Visualizer.addChunk(%d, '%s');\n"
+                             % (chunk, ":".join(turns[start:start + CHUNK_TURNS])))
+
     php_re = re.compile(r"<\? php \?>", re.S)
-    javascript = "const data = '%s';" % data
-    content = php_re.sub(javascript, content)
+    javascript = "const data = %s;" % json.dumps({
+        "planets": data.strip().partition("|")[0],
+        "numTurns": len(turns),
+        "chunkTurns": CHUNK_TURNS,
+        "chunkPath": os.path.basename(chunk_dir) + "/",
+        "ships": ships,
+        "production": production,
+    })
+    content = php_re.sub(lambda match: javascript, content)
 
     output = open(save_path, "w+")
     output.write(content)
     output.close()
 
 
-if __name__ == "__main__":
-    input_data = input()
-
+def visualize(data):
     current_path = os.path.dirname(__file__)
     generated_path = os.path.realpath(os.path.join(current_path, "generated.html"))
 
-    generate(input_data, generated_path)
+    generate(data, generated_path)
     webbrowser.open("file://" + generated_path)
+
+
+if __name__ == "__main__":
+    visualize(input())